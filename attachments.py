@@ -0,0 +1,49 @@
+"""Content-addressed file store for archived message attachments.
+
+Files live at ``<root>/<first two hex digits>/<sha256>``, so identical
+uploads are kept once no matter how many messages carried them. The store
+only deals with bytes on disk; which messages reference a blob, and when
+it was last used, is tracked in SQLite by the bot.
+"""
+
+import hashlib
+import os
+import tempfile
+
+
+class AttachmentStore:
+    def __init__(self, root: str):
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+
+    def path(self, sha256: str) -> str:
+        return os.path.join(self.root, sha256[:2], sha256)
+
+    def exists(self, sha256: str) -> bool:
+        return os.path.exists(self.path(sha256))
+
+    def put(self, data: bytes) -> tuple[str, bool]:
+        """Store ``data``; returns (sha256, whether a new file was written)."""
+        sha256 = hashlib.sha256(data).hexdigest()
+        path = self.path(sha256)
+        if os.path.exists(path):
+            return sha256, False
+
+        directory = os.path.dirname(path)
+        os.makedirs(directory, exist_ok=True)
+        # Write then rename, so a crash never leaves a truncated blob under its hash.
+        fd, tmp = tempfile.mkstemp(dir=directory, prefix=".tmp-")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp, path)
+        except BaseException:
+            os.unlink(tmp)
+            raise
+        return sha256, True
+
+    def remove(self, sha256: str):
+        try:
+            os.unlink(self.path(sha256))
+        except FileNotFoundError:
+            pass
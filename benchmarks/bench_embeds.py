@@ -0,0 +1,115 @@
+"""Micro-benchmark: hand-built log embeds vs. prebuilt EmbedTemplate payloads.
+
+Both paths end in the payload dict discord.py puts on the wire, so the
+legacy side pays for ``Embed(...)`` + ``add_field`` + ``to_dict`` exactly
+like the old handlers did.
+
+    python benchmarks/bench_embeds.py [iterations]
+"""
+
+import os
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import discord  # noqa: E402
+
+from embeds import EmbedTemplate  # noqa: E402
+
+ROLE_ASSIGNED = EmbedTemplate("Role Assigned", color=discord.Color.green(), fields=("User", "Role"))
+MESSAGE_DELETED = EmbedTemplate("Message Deleted", color=discord.Color.red(), fields=("Channel", "Content"))
+MOD_LOG = EmbedTemplate(color=discord.Color.red())
+
+
+def legacy_role_assigned():
+    embed = discord.Embed(title="Role Assigned", color=discord.Color.green(), timestamp=datetime.utcnow())
+    embed.add_field(name="User", value="<@1190692291535446156>", inline=False)
+    embed.add_field(name="Role", value="<@&1473745556198260890>", inline=False)
+    return embed.to_dict()
+
+
+def template_role_assigned():
+    return ROLE_ASSIGNED.embed("<@1190692291535446156>", "<@&1473745556198260890>").to_dict()
+
+
+def legacy_message_deleted():
+    embed = discord.Embed(
+        title="Message Deleted",
+        description="Message by <@1190692291535446156> was deleted",
+        color=discord.Color.red(),
+        timestamp=datetime.utcnow()
+    )
+    embed.add_field(name="Channel", value="<#1472748211038064832>", inline=False)
+    embed.add_field(name="Content", value="hello world", inline=False)
+    embed.set_thumbnail(url="https://cdn.discordapp.com/avatars/1/abc.png")
+    return embed.to_dict()
+
+
+def template_message_deleted():
+    return MESSAGE_DELETED.embed(
+        "<#1472748211038064832>",
+        "hello world",
+        description="Message by <@1190692291535446156> was deleted",
+        thumbnail="https://cdn.discordapp.com/avatars/1/abc.png",
+    ).to_dict()
+
+
+def legacy_mod_log():
+    embed = discord.Embed(title="User Banned | Case #42", color=discord.Color.red(), timestamp=datetime.utcnow())
+    embed.add_field(name="User", value="someone (<@1>)", inline=False)
+    embed.add_field(name="Moderator", value="<@2>", inline=False)
+    embed.add_field(name="Reason", value="spam", inline=False)
+    return embed.to_dict()
+
+
+def template_mod_log():
+    return MOD_LOG.embed(
+        title="User Banned | Case #42",
+        extra_fields=[("User", "someone (<@1>)"), ("Moderator", "<@2>"), ("Reason", "spam")],
+    ).to_dict()
+
+
+CASES = [
+    ("role_assigned", legacy_role_assigned, template_role_assigned),
+    ("message_deleted", legacy_message_deleted, template_message_deleted),
+    ("mod_log", legacy_mod_log, template_mod_log),
+]
+
+
+def measure(fn, iterations: int) -> tuple[float, float]:
+    """Return (microseconds per event, allocated blocks per event)."""
+    for _ in range(1000):
+        fn()
+
+    started = time.perf_counter()
+    for _ in range(iterations):
+        fn()
+    per_call_us = (time.perf_counter() - started) / iterations * 1e6
+
+    sample = min(iterations, 10_000)
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    keep = [fn() for _ in range(sample)]
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    blocks = sum(stat.count_diff for stat in after.compare_to(before, "filename"))
+    del keep
+    return per_call_us, blocks / sample
+
+
+def main():
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    print(f"{'event':<18}{'path':<10}{'us/event':>10}{'blocks/event':>14}")
+    for name, legacy, template in CASES:
+        legacy_us, legacy_blocks = measure(legacy, iterations)
+        template_us, template_blocks = measure(template, iterations)
+        print(f"{name:<18}{'legacy':<10}{legacy_us:>10.2f}{legacy_blocks:>14.1f}")
+        print(f"{'':<18}{'template':<10}{template_us:>10.2f}{template_blocks:>14.1f}")
+        print(f"{'':<18}{'speedup':<10}{legacy_us / template_us:>9.2f}x")
+
+
+if __name__ == "__main__":
+    main()
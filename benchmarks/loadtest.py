@@ -0,0 +1,527 @@
+"""Offline load test: replay synthetic gateway traffic against bot.py.
+
+Nothing here talks to Discord or Roblox. Gateway events are delivered by
+calling the registered handlers directly with fake guild/member/message
+objects. Every outbound Discord call (channel send, DM, timeout, kick,
+ban, interaction response) goes through ``FakeDiscordHTTP``, which counts
+it and sleeps for a configurable latency. Roblox endpoints are served by a
+local aiohttp stub that the bot's ``ROBLOX_*_API`` URLs are pointed at.
+
+    python benchmarks/loadtest.py                      # every scenario
+    python benchmarks/loadtest.py raid --count 500 --rate 100
+    python benchmarks/loadtest.py chat --count 2000 --rate 33 --latency-ms 80
+
+Handler latency is measured per event from dispatch to return, so
+background work spawned by a handler (moderation DMs/logs) shows up in
+the outbound counts but not in the latency column.
+"""
+
+import argparse
+import asyncio
+import itertools
+import os
+import random
+import sys
+import tempfile
+import time
+from collections import Counter
+from dataclasses import dataclass, field
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import discord  # noqa: E402
+from aiohttp import web  # noqa: E402
+
+import bot as app  # noqa: E402
+
+_ids = itertools.count(10_000_000_000_000_000)
+
+
+# ----------------- FAKE DISCORD -----------------
+
+class FakeDiscordHTTP:
+    def __init__(self, latency: float):
+        self.latency = latency
+        self.requests: Counter[str] = Counter()
+
+    async def call(self, route: str):
+        self.requests[route] += 1
+        if self.latency:
+            await asyncio.sleep(self.latency * random.uniform(0.5, 1.5))
+
+
+HTTP = FakeDiscordHTTP(0.0)
+
+
+@dataclass(eq=False)
+class FakeRole:
+    id: int
+    name: str
+    default: bool = False
+
+    @property
+    def mention(self) -> str:
+        return f"<@&{self.id}>"
+
+    def is_default(self) -> bool:
+        return self.default
+
+
+@dataclass(eq=False)
+class FakeChannel:
+    id: int
+    name: str
+    guild: "FakeGuild | None" = None
+
+    @property
+    def mention(self) -> str:
+        return f"<#{self.id}>"
+
+    async def send(self, content=None, **kwargs):
+        embeds = kwargs.get("embeds") or ([kwargs["embed"]] if kwargs.get("embed") is not None else [])
+        for embed in embeds:
+            embed.to_dict()
+        await HTTP.call("channel.send")
+        return FakeMessage(id=next(_ids), author=BOT_USER, channel=self, guild=self.guild, content=content or "")
+
+
+class FakeDMChannel(FakeChannel):
+    async def send(self, content=None, **kwargs):
+        await HTTP.call("dm.send")
+
+
+@dataclass(eq=False)
+class FakeUser:
+    id: int
+    name: str
+    bot: bool = False
+    avatar = None
+    guild: "FakeGuild | None" = None
+    roles: list = field(default_factory=list)
+    joined_at: datetime = field(default_factory=discord.utils.utcnow)
+
+    def __str__(self) -> str:
+        return self.name
+
+    @property
+    def mention(self) -> str:
+        return f"<@{self.id}>"
+
+    @property
+    def _roles(self) -> discord.utils.SnowflakeList:
+        # discord.Member keeps raw role IDs alongside the Role objects.
+        return discord.utils.SnowflakeList(role.id for role in self.roles if role.id != self.guild.id)
+
+    async def send(self, *args, **kwargs):
+        await HTTP.call("dm.send")
+
+    async def create_dm(self):
+        await HTTP.call("user.create_dm")
+        return FakeDMChannel(id=next(_ids), name=f"dm-{self.id}")
+
+    async def timeout(self, until, *, reason=None):
+        await HTTP.call("member.timeout")
+
+    async def kick(self, *, reason=None):
+        await HTTP.call("member.kick")
+
+    async def add_roles(self, *roles, reason=None):
+        await HTTP.call("member.add_roles")
+
+    async def remove_roles(self, *roles, reason=None):
+        await HTTP.call("member.remove_roles")
+
+
+@dataclass(eq=False)
+class FakeGuild:
+    id: int
+    channels: list = field(default_factory=list)
+    shard_id: int = 0
+
+    async def ban(self, user, *, reason=None, delete_message_days=0):
+        await HTTP.call("guild.ban")
+
+    async def unban(self, user, *, reason=None):
+        await HTTP.call("guild.unban")
+
+    def get_role(self, role_id):
+        return FakeRole(role_id, "role")
+
+    async def fetch_member(self, member_id):
+        await HTTP.call("guild.fetch_member")
+        return FakeUser(id=member_id, name="member", guild=self)
+
+
+@dataclass(eq=False)
+class FakeMessage:
+    id: int
+    author: FakeUser
+    channel: FakeChannel
+    guild: FakeGuild | None
+    content: str = ""
+    mentions: list = field(default_factory=list)
+    attachments: list = field(default_factory=list)
+    embeds: list = field(default_factory=list)
+    created_at: datetime = field(default_factory=discord.utils.utcnow)
+    reference = None
+
+
+@dataclass
+class FakeBulkDelete:
+    guild_id: int
+    channel_id: int
+    message_ids: set
+    cached_messages: list
+
+
+class FakeResponse:
+    def __init__(self):
+        self._done = False
+
+    def is_done(self) -> bool:
+        return self._done
+
+    async def defer(self, **kwargs):
+        self._done = True
+        await HTTP.call("interaction.defer")
+
+    async def send_message(self, *args, **kwargs):
+        self._done = True
+        await HTTP.call("interaction.respond")
+
+
+class FakeFollowup:
+    async def send(self, *args, **kwargs):
+        await HTTP.call("interaction.followup")
+
+
+class FakeInteraction:
+    def __init__(self, guild: FakeGuild, user: FakeUser, channel: FakeChannel):
+        self.guild = guild
+        self.user = user
+        self.channel = channel
+        self.response = FakeResponse()
+        self.followup = FakeFollowup()
+        self.extras = {}
+        self.command = None
+
+
+BOT_USER = FakeUser(id=next(_ids), name="Blue Horizon", bot=True)
+
+
+# ----------------- FAKE ROBLOX -----------------
+
+class RobloxStub:
+    def __init__(self, latency: float):
+        self.latency = latency
+        self.requests: Counter[str] = Counter()
+        self.roles = [
+            {"id": 100 + rank, "name": f"Rank {rank}", "rank": rank}
+            for rank in (1, 5, 10, 50, 100, 255)
+        ]
+        self.runner = None
+        self.base = None
+
+    async def _delay(self, route: str):
+        self.requests[route] += 1
+        if self.latency:
+            await asyncio.sleep(self.latency * random.uniform(0.5, 1.5))
+
+    async def usernames(self, request):
+        await self._delay("usernames")
+        body = await request.json()
+        return web.json_response({
+            "data": [{"id": abs(hash(name)) % 10**9, "name": name} for name in body["usernames"]]
+        })
+
+    async def group_roles(self, request):
+        await self._delay("group_roles")
+        return web.json_response({"groupId": app.ROBLOX_GROUP_ID, "roles": self.roles})
+
+    async def user_group_roles(self, request):
+        await self._delay("user_group_roles")
+        return web.json_response({
+            "data": [{"group": {"id": app.ROBLOX_GROUP_ID}, "role": random.choice(self.roles[1:-1])}]
+        })
+
+    async def set_rank(self, request):
+        await self._delay("set_rank")
+        return web.json_response({})
+
+    async def start(self):
+        web_app = web.Application()
+        web_app.router.add_post("/v1/usernames/users", self.usernames)
+        web_app.router.add_get("/v1/groups/{group_id}/roles", self.group_roles)
+        web_app.router.add_get("/v1/users/{user_id}/groups/roles", self.user_group_roles)
+        web_app.router.add_patch("/v1/groups/{group_id}/users/{user_id}", self.set_rank)
+        self.runner = web.AppRunner(web_app)
+        await self.runner.setup()
+        site = web.TCPSite(self.runner, "127.0.0.1", 0)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        self.base = f"http://127.0.0.1:{port}"
+        app.ROBLOX_USERS_API = f"{self.base}/v1/usernames/users"
+        app.ROBLOX_GROUPS_API = f"{self.base}/v1"
+        app.ROBLOX_API_KEY = app.ROBLOX_API_KEY or "loadtest"
+
+    async def stop(self):
+        await self.runner.cleanup()
+
+
+# ----------------- WORLD -----------------
+
+class World:
+    def __init__(self, members: int):
+        self.guild = FakeGuild(id=app.GUILD_ID)
+        self.log_channel = FakeChannel(id=next(_ids), name=app.LOG_CHANNEL_NAME, guild=self.guild)
+        self.general = FakeChannel(id=next(_ids), name="general", guild=self.guild)
+        self.guild.channels = [self.general, self.log_channel]
+        self.everyone = FakeRole(self.guild.id, "@everyone", default=True)
+        self.roles = [FakeRole(next(_ids), f"role-{i}") for i in range(20)]
+        self.members = [self.member() for _ in range(members)]
+        self.staff = FakeUser(id=next(_ids), name="moderator", guild=self.guild)
+        # a slice of members with linked Roblox accounts for the rank commands
+        self.linked = self.members[:50]
+        for i, member in enumerate(self.linked):
+            app.save_account_link(member.id, 10_000 + i, f"linked{i}", None, self.staff.id)
+
+    def member(self) -> FakeUser:
+        user_id = next(_ids)
+        return FakeUser(id=user_id, name=f"user{user_id % 100000}", guild=self.guild, roles=[self.everyone])
+
+    def message(self, author: FakeUser | None = None, channel: FakeChannel | None = None) -> FakeMessage:
+        author = author or random.choice(self.members)
+        mentions = []
+        if random.random() < 0.02:
+            mentions.append(FakeUser(id=app.OWNER_ID, name="owner"))
+        return FakeMessage(
+            id=next(_ids),
+            author=author,
+            channel=channel or self.general,
+            guild=self.guild,
+            content=f"message {random.randrange(10**6)}",
+            mentions=mentions,
+        )
+
+    def interaction(self) -> FakeInteraction:
+        return FakeInteraction(self.guild, self.staff, self.general)
+
+
+# ----------------- SCENARIOS -----------------
+
+def event_raid(world: World):
+    member = world.member()
+    return app.on_member_join(member)
+
+
+def event_chat(world: World):
+    return app.on_message(world.message())
+
+
+def event_delete(world: World):
+    if random.random() < 0.05:
+        # a bot log message being deleted from the log channel
+        message = world.message(author=BOT_USER, channel=world.log_channel)
+        message.embeds = [discord.Embed(title="Member Joined")]
+        return app.on_message_delete(message)
+    return app.on_message_delete(world.message())
+
+
+def event_wipe(world: World):
+    # someone purges a page of the log channel; half of it is still cached
+    messages = [world.message(author=BOT_USER, channel=world.log_channel) for _ in range(100)]
+    for message in messages:
+        message.embeds = [discord.Embed(title="Member Joined", description=message.content)]
+    return app.on_raw_bulk_message_delete(FakeBulkDelete(
+        guild_id=world.guild.id,
+        channel_id=world.log_channel.id,
+        message_ids={message.id for message in messages},
+        cached_messages=messages[:50],
+    ))
+
+
+def event_roles(world: World):
+    member = random.choice(world.members)
+    before = FakeUser(id=member.id, name=member.name, guild=world.guild, roles=list(member.roles))
+    after = FakeUser(id=member.id, name=member.name, guild=world.guild, roles=list(member.roles))
+    role = random.choice(world.roles)
+    if role in after.roles:
+        after.roles.remove(role)
+    else:
+        after.roles.append(role)
+    member.roles = after.roles
+    return app.on_member_update(before, after)
+
+
+def event_moderation(world: World):
+    target = random.choice(world.members)
+    interaction = world.interaction()
+    command = random.choice(["warn", "timeout", "kick", "ban"])
+    if command == "timeout":
+        return app.timeout.callback(interaction, target, "10m", "load test")
+    return getattr(app, command).callback(interaction, target, "load test")
+
+
+def event_promote(world: World):
+    interaction = world.interaction()
+    command = random.choice([app.promote_command, app.demote_command])
+    if random.random() < 0.5:
+        return command.callback(interaction, member=random.choice(world.linked))
+    return command.callback(interaction, username=f"player{random.randrange(10**6)}")
+
+
+SCENARIOS = {
+    # name: (event factory, default count, default rate per second)
+    "raid": (event_raid, 500, 100.0),
+    "chat": (event_chat, 2000, 2000 / 60),
+    "delete": (event_delete, 500, 20.0),
+    "wipe": (event_wipe, 10, 1.0),
+    "roles": (event_roles, 500, 20.0),
+    "moderation": (event_moderation, 200, 5.0),
+    "promote": (event_promote, 100, 5.0),
+}
+
+
+def percentile(values: list[float], q: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(q * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def db_totals() -> tuple[int, float]:
+    calls = 0
+    seconds = 0.0
+    for _, count, mean, _ in app.DB_DURATION.summary():
+        calls += count
+        seconds += count * mean
+    return calls, seconds
+
+
+async def run_scenario(name: str, world: World, count: int, rate: float) -> dict:
+    factory = SCENARIOS[name][0]
+    latencies: list[float] = []
+    failures = 0
+    HTTP.requests.clear()
+    ROBLOX.requests.clear()
+    db_calls_before, db_seconds_before = db_totals()
+
+    async def timed_event(coro):
+        nonlocal failures
+        started = time.perf_counter()
+        try:
+            await coro
+        except Exception:
+            failures += 1
+        latencies.append(time.perf_counter() - started)
+
+    interval = 1 / rate if rate > 0 else 0
+    loop = asyncio.get_running_loop()
+    start = loop.time()
+    tasks = []
+    for i in range(count):
+        delay = start + i * interval - loop.time()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        tasks.append(asyncio.create_task(timed_event(factory(world))))
+
+    await asyncio.gather(*tasks)
+    # let background side effects (DMs, log sends) finish before counting
+    while app.background_tasks:
+        await asyncio.gather(*app.background_tasks, return_exceptions=True)
+    wall = loop.time() - start
+
+    db_calls_after, db_seconds_after = db_totals()
+    return {
+        "scenario": name,
+        "events": count,
+        "wall": wall,
+        "p50": percentile(latencies, 0.50),
+        "p99": percentile(latencies, 0.99),
+        "max": max(latencies, default=0.0),
+        "failures": failures,
+        "discord": dict(HTTP.requests),
+        "roblox": dict(ROBLOX.requests),
+        "db_calls": db_calls_after - db_calls_before,
+        "db_seconds": db_seconds_after - db_seconds_before,
+    }
+
+
+def print_report(results: list[dict]):
+    header = f"{'scenario':<12}{'events':>8}{'wall s':>9}{'p50 ms':>9}{'p99 ms':>9}{'max ms':>9}{'fail':>6}{'sqlite ms':>11}{'db calls':>10}"
+    print(header)
+    print("-" * len(header))
+    for r in results:
+        print(
+            f"{r['scenario']:<12}{r['events']:>8}{r['wall']:>9.2f}{r['p50'] * 1000:>9.2f}{r['p99'] * 1000:>9.2f}"
+            f"{r['max'] * 1000:>9.2f}{r['failures']:>6}{r['db_seconds'] * 1000:>11.1f}{r['db_calls']:>10}"
+        )
+    print()
+    for r in results:
+        outbound = ", ".join(f"{route}={n}" for route, n in sorted(r["discord"].items())) or "none"
+        print(f"{r['scenario']:<12} discord: {outbound}")
+        if r["roblox"]:
+            roblox = ", ".join(f"{route}={n}" for route, n in sorted(r["roblox"].items()))
+            print(f"{'':<12} roblox:  {roblox}")
+
+
+ROBLOX = RobloxStub(0.0)
+
+
+async def _no_prefix_commands(message):
+    return None
+
+
+async def _fetch_user(user_id):
+    await HTTP.call("bot.fetch_user")
+    return FakeUser(id=user_id, name="owner")
+
+
+async def main(args):
+    HTTP.latency = args.latency_ms / 1000
+    ROBLOX.latency = args.roblox_latency_ms / 1000
+    random.seed(args.seed)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        app.DB_PATH = os.path.join(tmp, "loadtest.db")
+        app.init_db()
+        app.bot._connection.user = BOT_USER
+        # No prefix commands are registered; skip building a commands.Context
+        # that would need a real ConnectionState behind the fake message.
+        app.bot.process_commands = _no_prefix_commands
+        app.bot.fetch_user = _fetch_user
+        await ROBLOX.start()
+        try:
+            world = World(members=args.members)
+            app.bot.get_guild = lambda guild_id: world.guild if guild_id == world.guild.id else None
+            names = list(SCENARIOS) if args.scenario == "all" else [args.scenario]
+            results = []
+            for name in names:
+                _, default_count, default_rate = SCENARIOS[name]
+                results.append(await run_scenario(
+                    name, world, args.count or default_count, args.rate or default_rate
+                ))
+        finally:
+            await ROBLOX.stop()
+            if app.http_session is not None:
+                await app.http_session.close()
+
+    print_report(results)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("scenario", nargs="?", default="all", choices=["all", *SCENARIOS])
+    parser.add_argument("--count", type=int, default=0, help="events per scenario (default: scenario preset)")
+    parser.add_argument("--rate", type=float, default=0, help="events per second (default: scenario preset)")
+    parser.add_argument("--members", type=int, default=1000, help="members in the synthetic guild")
+    parser.add_argument("--latency-ms", type=float, default=50, help="simulated Discord API latency")
+    parser.add_argument("--roblox-latency-ms", type=float, default=80, help="simulated Roblox API latency")
+    parser.add_argument("--seed", type=int, default=1)
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    asyncio.run(main(parse_args()))
@@ -1,14 +1,38 @@
+import argparse
+import asyncio
+import csv
+import dataclasses
+import functools
+import gzip
+import hashlib
+import io
+import json
+import logging
 import os
 import sqlite3
 import re
+import signal
+import subprocess
+import sys
+import tempfile
+import time
 import requests
+from collections import OrderedDict
+from dataclasses import dataclass, field
 from datetime import datetime, timedelta
+from enum import IntEnum
+from typing import Awaitable, Callable, Literal
 
 import discord
 from discord import app_commands
 from discord.ext import commands
 from dotenv import load_dotenv
 
+from attachments import AttachmentStore
+from dbwriter import WriterClient, WriterError, serve as serve_writer, wait_until_ready
+from embeds import EmbedTemplate
+from metrics import REGISTRY, start_http_server, timed
+
 # ----------------- CONFIG -----------------
 
 load_dotenv()
@@ -20,24 +44,183 @@ GUILD_ID = 1472748211038064832          # your guild IDF
 STAFF_ROLE_ID = 1472955865144365148     # staff role ID
 LOG_CHANNEL_NAME = "bluehorizon-logs"   # log channel name
 DB_PATH = "moderation.db"
+ARCHIVE_DB_PATH = os.getenv("ARCHIVE_DB_PATH", "moderation_archive.db")
+ARCHIVE_AFTER_DAYS = int(os.getenv("ARCHIVE_AFTER_DAYS", "365"))  # 0 disables cold-case archival
+
+# Attachment archiving is opt-in: set ATTACHMENT_ARCHIVE_DIR to enable it.
+ATTACHMENT_ARCHIVE_DIR = os.getenv("ATTACHMENT_ARCHIVE_DIR")
+ATTACHMENT_MAX_BYTES = int(os.getenv("ATTACHMENT_MAX_BYTES", str(8 << 20)))      # larger files are skipped
+ATTACHMENT_QUOTA_BYTES = int(os.getenv("ATTACHMENT_QUOTA_BYTES", str(2 << 30)))  # least recently used evicted past this
+ATTACHMENT_MAX_AGE_DAYS = int(os.getenv("ATTACHMENT_MAX_AGE_DAYS", "30"))
 
 OWNER_ID = 1190692291535446156          # you
 BETA_ROLE_ID = 1473745556198260890      # real beta role ID
+OWNERSHIP_IDS = {650411480017141770, 797497654451765279, 1190692291535446156}
+
+# The values above seed guild_config for the home guild (GUILD_ID). Every
+# other guild is configured with /config and starts from these defaults.
+
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+METRICS_PORT = int(os.getenv("METRICS_PORT", "0"))  # 0 disables the local /metrics endpoint
+FORCE_SYNC = os.getenv("FORCE_SYNC") == "1"         # re-upload commands even if the tree hash matches
 
-intents = discord.Intents.default()
-intents.message_content = True
-intents.members = True
-intents.guilds = True
+# Sharding. SHARD_COUNT unset runs a plain Bot; "auto" or a number runs an
+# AutoShardedBot. A cluster process also gets the shard ids it owns, its
+# cluster number and the address of the shared DB writer (see `cluster`).
+SHARD_COUNT = os.getenv("SHARD_COUNT")
+SHARD_IDS = [int(i) for i in os.getenv("SHARD_IDS", "").split(",") if i]
+CLUSTER_ID = int(os.getenv("CLUSTER_ID", "0"))
+DB_WRITER = os.getenv("DB_WRITER")                  # host:port or unix socket path
+
+log = logging.getLogger("bluehorizon")
+
+# ----------------- METRICS -----------------
+
+COMMAND_LATENCY = REGISTRY.histogram(
+    "bluehorizon_command_seconds", "Slash command latency from dispatch to completion.", ("command", "status")
+)
+EVENT_DURATION = REGISTRY.histogram("bluehorizon_event_seconds", "Gateway event handler duration.", ("event",))
+DB_DURATION = REGISTRY.histogram("bluehorizon_db_seconds", "SQLite call duration.", ("query",))
+ROBLOX_LATENCY = REGISTRY.histogram(
+    "bluehorizon_roblox_request_seconds", "Roblox API request latency.", ("endpoint", "status")
+)
+MOD_ACTION_PHASE = REGISTRY.histogram(
+    "bluehorizon_mod_action_seconds", "Moderation action phase duration.", ("action", "phase")
+)
+
+class InstrumentedTree(app_commands.CommandTree):
+    async def interaction_check(self, interaction: discord.Interaction) -> bool:
+        interaction.extras["started"] = time.perf_counter()
+        return True
+
+
+def observe_command(interaction: discord.Interaction, status: str):
+    started = interaction.extras.get("started")
+    if started is None:
+        return
+    name = interaction.command.qualified_name if interaction.command else "unknown"
+    COMMAND_LATENCY.observe(time.perf_counter() - started, command=name, status=status)
 
-bot = commands.Bot(command_prefix="!", intents=intents)
+
+LOG_SENDS = REGISTRY.counter("bluehorizon_log_sends_total", "Log channel messages sent, per shard.", ("shard",))
+
+
+# ----------------- APP -----------------
+
+class BlueHorizonMixin:
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.metrics_runner = None
+        self.shutdown_task: asyncio.Task | None = None
+
+    async def setup_hook(self):
+        # Runs once per process, before the gateway connects. on_ready fires
+        # again on every reconnect, so one-time init must not live there.
+        await asyncio.to_thread(init_db)
+        recent_events.load(await asyncio.to_thread(get_meta, f"recent_events:{CLUSTER_ID}"))
+        if CLUSTER_ID == 0:
+            await sync_commands_if_changed()
+        await restore_polls()
+        await restore_role_jobs()
+        if CLUSTER_ID == 0 and ARCHIVE_AFTER_DAYS:
+            start_archival()
+        if CLUSTER_ID == 0:
+            start_link_refresh()
+            start_announcements()
+
+        if METRICS_PORT:
+            self.metrics_runner = await start_http_server("127.0.0.1", METRICS_PORT)
+            log.info("Serving metrics on http://127.0.0.1:%s/metrics", METRICS_PORT)
+
+        try:
+            asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, self.begin_shutdown)
+        except NotImplementedError:
+            pass  # Windows: only Ctrl+C reaches close()
+
+    def begin_shutdown(self) -> asyncio.Task:
+        if self.shutdown_task is None:
+            self.shutdown_task = asyncio.create_task(self._shutdown(), name="shutdown")
+        return self.shutdown_task
+
+    async def close(self):
+        # discord.py may call close() more than once (signal, __aexit__);
+        # every caller waits on the same drain.
+        await self.begin_shutdown()
+
+    async def _shutdown(self):
+        # Drain while the gateway and HTTP client are still up, so pending
+        # log sends and DMs can still go out.
+        await drain_pending_work()
+        if self.metrics_runner is not None:
+            await self.metrics_runner.cleanup()
+        if http_session is not None:
+            await http_session.close()
+        await super().close()
+
+
+class BlueHorizon(BlueHorizonMixin, commands.Bot):
+    pass
+
+
+class ShardedBlueHorizon(BlueHorizonMixin, commands.AutoShardedBot):
+    pass
+
+
+def create_bot() -> commands.Bot:
+    intents = discord.Intents.default()
+    intents.message_content = True
+    intents.members = True
+    intents.guilds = True
+    kwargs = dict(command_prefix="!", intents=intents, tree_cls=InstrumentedTree)
+
+    if not SHARD_COUNT:
+        return BlueHorizon(**kwargs)
+    if SHARD_COUNT != "auto":
+        kwargs["shard_count"] = int(SHARD_COUNT)
+        if SHARD_IDS:
+            kwargs["shard_ids"] = SHARD_IDS
+    return ShardedBlueHorizon(**kwargs)
+
+
+def owns_guild(guild_id: int) -> bool:
+    """Whether this process's shards receive events for ``guild_id``."""
+    if not SHARD_IDS:
+        return True
+    return (guild_id >> 22) % int(SHARD_COUNT) in SHARD_IDS
+
+
+bot = create_bot()
 tree = bot.tree
 
 # ----------------- DATABASE -----------------
 
+# Functions that modify the database. In a clustered deployment they run in
+# the single writer process and are called over DB_WRITER; arguments and
+# results must therefore be JSON-serialisable. Reads always go straight to
+# SQLite (WAL mode lets readers in other processes proceed during writes).
+WRITE_OPS: dict[str, Callable] = {}
+writer_client = WriterClient(DB_WRITER) if DB_WRITER else None
+
+
+def db_write(fn):
+    WRITE_OPS[fn.__name__] = fn
+
+    @functools.wraps(fn)
+    def wrapper(*args):
+        if writer_client is not None:
+            return writer_client.call(fn.__name__, *args)
+        return fn(*args)
+    return wrapper
+
+
+@timed(DB_DURATION, label="query")
+@db_write
 def init_db():
     conn = sqlite3.connect(DB_PATH)
     c = conn.cursor()
 
+    c.execute("PRAGMA journal_mode=WAL")
+
     c.execute("""
         CREATE TABLE IF NOT EXISTS cases (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -59,187 +242,1831 @@ def init_db():
         )
     """)
 
+    c.execute("""
+        CREATE TABLE IF NOT EXISTS polls (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            guild_id INTEGER NOT NULL,
+            channel_id INTEGER NOT NULL,
+            message_id INTEGER,
+            author_id INTEGER NOT NULL,
+            question TEXT NOT NULL,
+            options TEXT NOT NULL,
+            counts TEXT NOT NULL,
+            closes_at TEXT,
+            closed INTEGER NOT NULL DEFAULT 0
+        )
+    """)
+
+    c.execute("""
+        CREATE TABLE IF NOT EXISTS poll_votes (
+            poll_id INTEGER NOT NULL,
+            user_id INTEGER NOT NULL,
+            option INTEGER NOT NULL,
+            PRIMARY KEY (poll_id, user_id)
+        )
+    """)
+
+    _ensure_column(c, "cases", "guild_id", "INTEGER")
+    _ensure_column(c, "warnings", "guild_id", "INTEGER")
+    c.execute("UPDATE cases SET guild_id = ? WHERE guild_id IS NULL", (GUILD_ID,))
+    c.execute("UPDATE warnings SET guild_id = ? WHERE guild_id IS NULL", (GUILD_ID,))
+    c.execute("CREATE INDEX IF NOT EXISTS idx_cases_guild_user ON cases (guild_id, user_id)")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_warnings_guild_user ON warnings (guild_id, user_id)")
+    # archive_cold_cases selects by age
+    c.execute("CREATE INDEX IF NOT EXISTS idx_cases_timestamp ON cases (timestamp)")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_warnings_timestamp ON warnings (timestamp)")
+
+    # Per-day case counts, kept in step with cases by every write that adds
+    # or removes one. Backfilled from existing cases, hot and archived, the
+    # first time.
+    c.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'daily_stats'")
+    backfill = c.fetchone() is None
+    c.execute("""
+        CREATE TABLE IF NOT EXISTS daily_stats (
+            guild_id INTEGER NOT NULL,
+            day TEXT NOT NULL,
+            moderator_id INTEGER NOT NULL,
+            action TEXT NOT NULL,
+            count INTEGER NOT NULL,
+            PRIMARY KEY (guild_id, day, moderator_id, action)
+        )
+    """)
+
+    # One row per user with cases moved to the archive database, so /history
+    # only opens the archive for users that actually have archived cases.
+    c.execute("""
+        CREATE TABLE IF NOT EXISTS case_summary (
+            guild_id INTEGER NOT NULL,
+            user_id INTEGER NOT NULL,
+            archived_cases INTEGER NOT NULL DEFAULT 0,
+            archived_warnings INTEGER NOT NULL DEFAULT 0,
+            first_timestamp TEXT,
+            last_timestamp TEXT,
+            PRIMARY KEY (guild_id, user_id)
+        )
+    """)
+
+    c.execute("""
+        CREATE TABLE IF NOT EXISTS guild_config (
+            guild_id INTEGER PRIMARY KEY,
+            staff_role_id INTEGER,
+            log_channel_name TEXT NOT NULL,
+            beta_role_id INTEGER,
+            ownership_ids TEXT NOT NULL DEFAULT '[]'
+        )
+    """)
+    _ensure_column(c, "guild_config", "helper_role_id", "INTEGER")
+    _ensure_column(c, "guild_config", "admin_role_id", "INTEGER")
+    c.execute(
+        "INSERT OR IGNORE INTO guild_config (guild_id, staff_role_id, log_channel_name, beta_role_id, ownership_ids) "
+        "VALUES (?, ?, ?, ?, ?)",
+        (GUILD_ID, STAFF_ROLE_ID, LOG_CHANNEL_NAME, BETA_ROLE_ID, json.dumps(sorted(OWNERSHIP_IDS))),
+    )
+
+    c.execute("""
+        CREATE TABLE IF NOT EXISTS meta (
+            key TEXT PRIMARY KEY,
+            value TEXT NOT NULL
+        )
+    """)
+
+    c.execute("""
+        CREATE TABLE IF NOT EXISTS role_jobs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            guild_id INTEGER NOT NULL,
+            author_id INTEGER NOT NULL,
+            role_id INTEGER NOT NULL,
+            action TEXT NOT NULL,
+            target TEXT NOT NULL,
+            created_at TEXT NOT NULL,
+            finished INTEGER NOT NULL DEFAULT 0
+        )
+    """)
+
+    # state: 0 pending, 1 changed, 2 skipped (already in the wanted state), 3 failed
+    c.execute("""
+        CREATE TABLE IF NOT EXISTS role_job_members (
+            job_id INTEGER NOT NULL,
+            user_id INTEGER NOT NULL,
+            state INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (job_id, user_id)
+        )
+    """)
+
+    # Discord account -> Roblox account, with the last group role seen for it.
+    c.execute("""
+        CREATE TABLE IF NOT EXISTS account_links (
+            discord_id INTEGER PRIMARY KEY,
+            roblox_id INTEGER NOT NULL,
+            roblox_username TEXT NOT NULL,
+            role_id INTEGER,
+            role_name TEXT,
+            rank INTEGER,
+            checked_at REAL NOT NULL DEFAULT 0,
+            linked_by INTEGER,
+            linked_at TEXT NOT NULL
+        )
+    """)
+    c.execute("CREATE INDEX IF NOT EXISTS idx_account_links_checked ON account_links (checked_at)")
+
+    c.execute("""
+        CREATE TABLE IF NOT EXISTS announcements (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            guild_id INTEGER NOT NULL,
+            author_id INTEGER NOT NULL,
+            content TEXT NOT NULL,
+            send_at TEXT NOT NULL,
+            created_at TEXT NOT NULL
+        )
+    """)
+
+    # state: 0 pending, 1 sent, 2 failed for good
+    c.execute("""
+        CREATE TABLE IF NOT EXISTS announcement_deliveries (
+            announcement_id INTEGER NOT NULL,
+            channel_id INTEGER NOT NULL,
+            state INTEGER NOT NULL DEFAULT 0,
+            attempts INTEGER NOT NULL DEFAULT 0,
+            next_attempt_at TEXT NOT NULL,
+            error TEXT,
+            PRIMARY KEY (announcement_id, channel_id)
+        )
+    """)
+    c.execute(
+        "CREATE INDEX IF NOT EXISTS idx_deliveries_pending ON announcement_deliveries (next_attempt_at) WHERE state = 0"
+    )
+
+    # Archived attachment blobs (one row per distinct file) and the
+    # attachments that point at them.
+    c.execute("""
+        CREATE TABLE IF NOT EXISTS attachment_blobs (
+            sha256 TEXT PRIMARY KEY,
+            size INTEGER NOT NULL,
+            last_used REAL NOT NULL
+        )
+    """)
+    c.execute("CREATE INDEX IF NOT EXISTS idx_attachment_blobs_used ON attachment_blobs (last_used)")
+    c.execute("""
+        CREATE TABLE IF NOT EXISTS attachment_files (
+            attachment_id INTEGER PRIMARY KEY,
+            message_id INTEGER NOT NULL,
+            sha256 TEXT NOT NULL,
+            filename TEXT NOT NULL,
+            content_type TEXT
+        )
+    """)
+    c.execute("CREATE INDEX IF NOT EXISTS idx_attachment_files_message ON attachment_files (message_id)")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_attachment_files_sha ON attachment_files (sha256)")
+
     conn.commit()
+    if backfill:
+        # After the commit: ATTACH of the archive is not allowed in a transaction.
+        _rebuild_daily_stats(c)
+        conn.commit()
+    conn.close()
+
+
+def _ensure_column(c: sqlite3.Cursor, table: str, column: str, ddl: str):
+    columns = {row[1] for row in c.execute(f"PRAGMA table_info({table})")}
+    if column not in columns:
+        c.execute(f"ALTER TABLE {table} ADD COLUMN {column} {ddl}")
+
+
+@timed(DB_DURATION, label="query")
+def get_meta(key: str) -> str | None:
+    conn = sqlite3.connect(DB_PATH)
+    row = conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
     conn.close()
+    return row[0] if row else None
 
 
-def add_case(user_id: int, moderator_id: int, action: str, reason: str | None):
+@timed(DB_DURATION, label="query")
+@db_write
+def set_meta(key: str, value: str):
+    conn = sqlite3.connect(DB_PATH)
+    conn.execute(
+        "INSERT INTO meta (key, value) VALUES (?, ?) ON CONFLICT (key) DO UPDATE SET value = excluded.value",
+        (key, value),
+    )
+    conn.commit()
+    conn.close()
+
+
+@timed(DB_DURATION, label="query")
+@db_write
+def delete_meta(key: str):
+    conn = sqlite3.connect(DB_PATH)
+    conn.execute("DELETE FROM meta WHERE key = ?", (key,))
+    conn.commit()
+    conn.close()
+
+
+@timed(DB_DURATION, label="query")
+@db_write
+def record_case(
+    guild_id: int,
+    user_id: int,
+    moderator_id: int,
+    action: str,
+    reason: str | None,
+    with_warning: bool = False,
+):
+    """Write a case (and optionally its warning) in a single transaction."""
     conn = sqlite3.connect(DB_PATH)
     c = conn.cursor()
     ts = datetime.utcnow().isoformat()
+    warning_id = None
+    if with_warning:
+        c.execute(
+            "INSERT INTO warnings (guild_id, user_id, moderator_id, reason, timestamp) VALUES (?, ?, ?, ?, ?)",
+            (guild_id, user_id, moderator_id, reason, ts),
+        )
+        warning_id = c.lastrowid
     c.execute(
-        "INSERT INTO cases (user_id, moderator_id, action, reason, timestamp) VALUES (?, ?, ?, ?, ?)",
-        (user_id, moderator_id, action, reason, ts),
+        "INSERT INTO cases (guild_id, user_id, moderator_id, action, reason, timestamp) VALUES (?, ?, ?, ?, ?, ?)",
+        (guild_id, user_id, moderator_id, action, reason, ts),
     )
     case_id = c.lastrowid
+    _count_case(c, guild_id, ts, moderator_id, action)
     conn.commit()
     conn.close()
-    return case_id
+    return case_id, warning_id
 
 
-def add_warning(user_id: int, moderator_id: int, reason: str | None):
+@timed(DB_DURATION, label="query")
+def get_history(guild_id: int, user_id: int, limit: int = 10, offset: int = 0):
+    """Newest-first page of a user's cases, continuing into the archive past the hot rows."""
     conn = sqlite3.connect(DB_PATH)
     c = conn.cursor()
-    ts = datetime.utcnow().isoformat()
     c.execute(
-        "INSERT INTO warnings (user_id, moderator_id, reason, timestamp) VALUES (?, ?, ?, ?)",
-        (user_id, moderator_id, reason, ts),
+        "SELECT id, action, reason, moderator_id, timestamp FROM cases "
+        "WHERE guild_id = ? AND user_id = ? ORDER BY id DESC LIMIT ? OFFSET ?",
+        (guild_id, user_id, limit, offset),
     )
-    warning_id = c.lastrowid
+    rows = c.fetchall()
+
+    if len(rows) < limit and get_case_summary(guild_id, user_id, c) is not None:
+        c.execute("SELECT COUNT(*) FROM cases WHERE guild_id = ? AND user_id = ?", (guild_id, user_id))
+        hot = c.fetchone()[0]
+        _attach_archive(c)
+        c.execute(
+            "SELECT id, action, reason, moderator_id, timestamp FROM archive.cases "
+            "WHERE guild_id = ? AND user_id = ? ORDER BY id DESC LIMIT ? OFFSET ?",
+            (guild_id, user_id, limit - len(rows), max(0, offset - hot)),
+        )
+        rows += c.fetchall()
+    conn.close()
+    return rows
+
+
+@timed(DB_DURATION, label="query")
+@db_write
+def revoke_case(guild_id: int, case_id: int) -> bool:
+    conn = sqlite3.connect(DB_PATH)
+    c = conn.cursor()
+    archived = os.path.exists(ARCHIVE_DB_PATH)
+    if archived:
+        _attach_archive(c)  # ATTACH is not allowed once the DELETE opens a transaction
+    _uncount_cases(c, "cases", "id = ? AND guild_id = ?", (case_id, guild_id))
+    c.execute("DELETE FROM cases WHERE id = ? AND guild_id = ?", (case_id, guild_id))
+    deleted = c.rowcount > 0
+    if not deleted and archived:
+        c.execute("SELECT user_id FROM archive.cases WHERE id = ? AND guild_id = ?", (case_id, guild_id))
+        row = c.fetchone()
+        if row is not None:
+            _uncount_cases(c, "archive.cases", "id = ?", (case_id,))
+            c.execute("DELETE FROM archive.cases WHERE id = ?", (case_id,))
+            _refresh_case_summary(c, [(guild_id, row[0])])
+            deleted = True
     conn.commit()
     conn.close()
-    return warning_id
+    return deleted
 
 
-def get_history(user_id: int, limit: int = 10):
+@timed(DB_DURATION, label="query")
+@db_write
+def clear_history(guild_id: int, user_id: int):
     conn = sqlite3.connect(DB_PATH)
     c = conn.cursor()
+    if get_case_summary(guild_id, user_id, c) is not None:
+        _attach_archive(c)
+        _uncount_cases(c, "archive.cases", "guild_id = ? AND user_id = ?", (guild_id, user_id))
+        c.execute("DELETE FROM archive.cases WHERE guild_id = ? AND user_id = ?", (guild_id, user_id))
+        _refresh_case_summary(c, [(guild_id, user_id)])
+    _uncount_cases(c, "cases", "guild_id = ? AND user_id = ?", (guild_id, user_id))
+    c.execute("DELETE FROM cases WHERE guild_id = ? AND user_id = ?", (guild_id, user_id))
+    conn.commit()
+    conn.close()
+
+
+# ----------------- DATABASE: DAILY STATS -----------------
+
+def _count_case(c: sqlite3.Cursor, guild_id: int, ts: str, moderator_id: int, action: str):
     c.execute(
-        "SELECT id, action, reason, moderator_id, timestamp FROM cases WHERE user_id = ? ORDER BY id DESC LIMIT ?",
-        (user_id, limit),
+        "INSERT INTO daily_stats (guild_id, day, moderator_id, action, count) VALUES (?, ?, ?, ?, 1) "
+        "ON CONFLICT (guild_id, day, moderator_id, action) DO UPDATE SET count = count + 1",
+        (guild_id, ts[:10], moderator_id, action),
     )
+
+
+def _uncount_cases(c: sqlite3.Cursor, table: str, where: str, params: tuple):
+    """Take the cases matching ``where`` out of daily_stats; call before deleting them."""
+    c.execute(
+        f"SELECT COUNT(*), guild_id, substr(timestamp, 1, 10), moderator_id, action FROM {table} "
+        f"WHERE {where} GROUP BY 2, 3, 4, 5",
+        params,
+    )
+    groups = c.fetchall()
+    c.executemany(
+        "UPDATE daily_stats SET count = count - ? WHERE guild_id = ? AND day = ? AND moderator_id = ? AND action = ?",
+        groups,
+    )
+    c.executemany(
+        "DELETE FROM daily_stats WHERE guild_id = ? AND day = ? AND moderator_id = ? AND action = ? AND count <= 0",
+        [group[1:] for group in groups],
+    )
+
+
+def _rebuild_daily_stats(c: sqlite3.Cursor):
+    """Recount daily_stats from every case, hot and archived (after a bulk import)."""
+    source = "SELECT guild_id, timestamp, moderator_id, action FROM cases"
+    if os.path.exists(ARCHIVE_DB_PATH):
+        _attach_archive(c)
+        source += " UNION ALL SELECT guild_id, timestamp, moderator_id, action FROM archive.cases"
+    c.execute("DELETE FROM daily_stats")
+    c.execute(
+        "INSERT INTO daily_stats (guild_id, day, moderator_id, action, count) "
+        f"SELECT guild_id, substr(timestamp, 1, 10), moderator_id, action, COUNT(*) FROM ({source}) "
+        "GROUP BY 1, 2, 3, 4"
+    )
+
+
+@timed(DB_DURATION, label="query")
+def get_daily_stats(guild_id: int, since: str, moderator_id: int | None = None):
+    """(day, moderator_id, action, count) rollup rows from ``since`` (YYYY-MM-DD) on."""
+    conn = sqlite3.connect(DB_PATH)
+    c = conn.cursor()
+    query = "SELECT day, moderator_id, action, count FROM daily_stats WHERE guild_id = ? AND day >= ?"
+    params = [guild_id, since]
+    if moderator_id is not None:
+        query += " AND moderator_id = ?"
+        params.append(moderator_id)
+    c.execute(query, params)
     rows = c.fetchall()
     conn.close()
     return rows
 
 
+# ----------------- DATABASE: ARCHIVE -----------------
+
+ARCHIVE_BATCH = 5000                 # rows moved per transaction
+ARCHIVE_INTERVAL = 24 * 60 * 60      # seconds between archival runs
+
+
+def _attach_archive(c: sqlite3.Cursor):
+    c.execute("ATTACH DATABASE ? AS archive", (ARCHIVE_DB_PATH,))
+    c.execute("PRAGMA archive.journal_mode=WAL")
+    for table, columns in (
+        ("cases", "action TEXT NOT NULL,"),
+        ("warnings", ""),
+    ):
+        c.execute(f"""
+            CREATE TABLE IF NOT EXISTS archive.{table} (
+                id INTEGER PRIMARY KEY,
+                guild_id INTEGER,
+                user_id INTEGER NOT NULL,
+                moderator_id INTEGER NOT NULL,
+                {columns}
+                reason TEXT,
+                timestamp TEXT NOT NULL
+            )
+        """)
+        c.execute(f"CREATE INDEX IF NOT EXISTS archive.idx_{table}_guild_user ON {table} (guild_id, user_id)")
+
+
+def get_case_summary(guild_id: int, user_id: int, c: sqlite3.Cursor | None = None):
+    """(archived_cases, archived_warnings, first_timestamp, last_timestamp) or None."""
+    conn = None
+    if c is None:
+        conn = sqlite3.connect(DB_PATH)
+        c = conn.cursor()
+    c.execute(
+        "SELECT archived_cases, archived_warnings, first_timestamp, last_timestamp FROM case_summary "
+        "WHERE guild_id = ? AND user_id = ?",
+        (guild_id, user_id),
+    )
+    row = c.fetchone()
+    if conn is not None:
+        conn.close()
+    return row
+
+
+def _refresh_case_summary(c: sqlite3.Cursor, users: list[tuple[int, int]]):
+    # Recomputed from the archive rather than incremented, so re-running a
+    # batch that was half applied can never double count.
+    for guild_id, user_id in users:
+        c.execute(
+            "SELECT COUNT(*), MIN(timestamp), MAX(timestamp) FROM archive.cases WHERE guild_id = ? AND user_id = ?",
+            (guild_id, user_id),
+        )
+        cases, first, last = c.fetchone()
+        c.execute(
+            "SELECT COUNT(*) FROM archive.warnings WHERE guild_id = ? AND user_id = ?",
+            (guild_id, user_id),
+        )
+        warnings = c.fetchone()[0]
+        if not cases and not warnings:
+            c.execute("DELETE FROM case_summary WHERE guild_id = ? AND user_id = ?", (guild_id, user_id))
+            continue
+        c.execute(
+            "INSERT INTO case_summary (guild_id, user_id, archived_cases, archived_warnings, first_timestamp, "
+            "last_timestamp) VALUES (?, ?, ?, ?, ?, ?) ON CONFLICT (guild_id, user_id) DO UPDATE SET "
+            "archived_cases = excluded.archived_cases, archived_warnings = excluded.archived_warnings, "
+            "first_timestamp = excluded.first_timestamp, last_timestamp = excluded.last_timestamp",
+            (guild_id, user_id, cases, warnings, first, last),
+        )
+
+
+@timed(DB_DURATION, label="query")
+@db_write
+def archive_cold_batch(cutoff: str) -> list[int]:
+    """Move up to ARCHIVE_BATCH cases and ARCHIVE_BATCH warnings older than
+    ``cutoff`` (ISO timestamp) to the archive database, one transaction each.
+
+    One batch per call, so with a DB writer each call is a short write op and
+    other clusters' writes interleave. Returns [cases moved, warnings moved].
+    """
+    conn = sqlite3.connect(DB_PATH)
+    c = conn.cursor()
+    _attach_archive(c)
+    conn.commit()
+
+    moved = []
+    for table, columns in EXPORT_COLUMNS.items():
+        column_list = ", ".join(columns)
+        # A row whose id is already archived with different content stays hot
+        # instead of being dropped by the INSERT OR IGNORE below; an identical
+        # copy (an older export re-imported) is just removed from the hot table.
+        differs = " OR ".join(f"a.{column} IS NOT {table}.{column}" for column in columns[1:])
+        c.execute(
+            f"SELECT id FROM {table} WHERE timestamp < ? AND NOT EXISTS "
+            f"(SELECT 1 FROM archive.{table} a WHERE a.id = {table}.id AND ({differs})) "
+            "ORDER BY timestamp LIMIT ?",
+            (cutoff, ARCHIVE_BATCH),
+        )
+        ids = [row[0] for row in c.fetchall()]
+        if not ids:
+            moved.append(0)
+            continue
+        marks = ", ".join("?" * len(ids))
+        if table == "cases":
+            # Already archived duplicates were counted twice when imported.
+            _uncount_cases(c, table, f"id IN ({marks}) AND id IN (SELECT id FROM archive.cases)", tuple(ids))
+        c.execute(
+            f"INSERT OR IGNORE INTO archive.{table} ({column_list}) "
+            f"SELECT {column_list} FROM {table} WHERE id IN ({marks})",
+            ids,
+        )
+        c.execute(f"SELECT DISTINCT guild_id, user_id FROM {table} WHERE id IN ({marks})", ids)
+        users = c.fetchall()
+        c.execute(f"DELETE FROM {table} WHERE id IN ({marks})", ids)
+        _refresh_case_summary(c, users)
+        conn.commit()
+        moved.append(len(ids))
+    conn.close()
+    return moved
+
+
+def archive_cold_cases(cutoff: str) -> list[int]:
+    """Archive everything older than ``cutoff``; returns [cases moved, warnings moved]."""
+    totals = [0, 0]
+    while True:
+        moved = archive_cold_batch(cutoff)
+        if not any(moved):
+            return totals
+        totals = [total + count for total, count in zip(totals, moved)]
+
+
+# ----------------- DATABASE: GUILD CONFIG -----------------
+
+@dataclass(frozen=True)
+class GuildConfig:
+    guild_id: int
+    staff_role_id: int | None
+    log_channel_name: str
+    beta_role_id: int | None
+    ownership_ids: frozenset[int]
+    helper_role_id: int | None = None
+    admin_role_id: int | None = None
+
+
+# guild_id -> GuildConfig; every write goes through set_guild_config, which invalidates
+guild_configs: dict[int, GuildConfig] = {}
+
+
+@timed(DB_DURATION, label="query")
+def _load_guild_config(guild_id: int) -> GuildConfig:
+    conn = sqlite3.connect(DB_PATH)
+    row = conn.execute(
+        "SELECT staff_role_id, log_channel_name, beta_role_id, ownership_ids, helper_role_id, admin_role_id "
+        "FROM guild_config WHERE guild_id = ?",
+        (guild_id,),
+    ).fetchone()
+    conn.close()
+    if row is None:
+        return GuildConfig(guild_id, None, LOG_CHANNEL_NAME, None, frozenset())
+    staff_role_id, log_channel_name, beta_role_id, ownership_ids, helper_role_id, admin_role_id = row
+    return GuildConfig(
+        guild_id,
+        staff_role_id,
+        log_channel_name,
+        beta_role_id,
+        frozenset(json.loads(ownership_ids)),
+        helper_role_id,
+        admin_role_id,
+    )
+
+
+def get_guild_config(guild_id: int) -> GuildConfig:
+    config = guild_configs.get(guild_id)
+    if config is None:
+        config = guild_configs[guild_id] = _load_guild_config(guild_id)
+    return config
+
+
+@timed(DB_DURATION, label="query")
+@db_write
+def save_guild_config(
+    guild_id: int,
+    staff_role_id: int | None,
+    log_channel_name: str,
+    beta_role_id: int | None,
+    ownership_ids: list[int],
+    helper_role_id: int | None,
+    admin_role_id: int | None,
+):
+    conn = sqlite3.connect(DB_PATH)
+    conn.execute(
+        "INSERT INTO guild_config (guild_id, staff_role_id, log_channel_name, beta_role_id, ownership_ids, "
+        "helper_role_id, admin_role_id) VALUES (?, ?, ?, ?, ?, ?, ?) ON CONFLICT (guild_id) DO UPDATE SET "
+        "staff_role_id = excluded.staff_role_id, log_channel_name = excluded.log_channel_name, "
+        "beta_role_id = excluded.beta_role_id, ownership_ids = excluded.ownership_ids, "
+        "helper_role_id = excluded.helper_role_id, admin_role_id = excluded.admin_role_id",
+        (
+            guild_id,
+            staff_role_id,
+            log_channel_name,
+            beta_role_id,
+            json.dumps(ownership_ids),
+            helper_role_id,
+            admin_role_id,
+        ),
+    )
+    conn.commit()
+    conn.close()
+
+
+def set_guild_config(guild_id: int, **changes) -> GuildConfig:
+    config = dataclasses.replace(get_guild_config(guild_id), **changes)
+    save_guild_config(
+        guild_id,
+        config.staff_role_id,
+        config.log_channel_name,
+        config.beta_role_id,
+        sorted(config.ownership_ids),
+        config.helper_role_id,
+        config.admin_role_id,
+    )
+    guild_configs.pop(guild_id, None)
+    invalidate_permissions(guild_id)
+    return config
+
+
+# ----------------- DATABASE: POLLS -----------------
+
+@timed(DB_DURATION, label="query")
+@db_write
+def create_poll(guild_id: int, channel_id: int, author_id: int, question: str, options: list[str], closes_at: str | None):
+    conn = sqlite3.connect(DB_PATH)
+    c = conn.cursor()
+    c.execute(
+        "INSERT INTO polls (guild_id, channel_id, author_id, question, options, counts, closes_at) VALUES (?, ?, ?, ?, ?, ?, ?)",
+        (guild_id, channel_id, author_id, question, json.dumps(options), json.dumps([0] * len(options)), closes_at),
+    )
+    poll_id = c.lastrowid
+    conn.commit()
+    conn.close()
+    return poll_id
+
+
+@timed(DB_DURATION, label="query")
+@db_write
+def set_poll_message(poll_id: int, message_id: int):
+    conn = sqlite3.connect(DB_PATH)
+    conn.execute("UPDATE polls SET message_id = ? WHERE id = ?", (message_id, poll_id))
+    conn.commit()
+    conn.close()
+
+
+@timed(DB_DURATION, label="query")
+@db_write
+def flush_poll_votes(votes: list[tuple[int, int, int]], counts: list[tuple[int, list[int]]]):
+    """Upsert a batch of (poll_id, user_id, option) votes and the new per-poll counts in one transaction."""
+    conn = sqlite3.connect(DB_PATH)
+    with conn:
+        conn.executemany(
+            "INSERT INTO poll_votes (poll_id, user_id, option) VALUES (?, ?, ?) "
+            "ON CONFLICT (poll_id, user_id) DO UPDATE SET option = excluded.option",
+            votes,
+        )
+        conn.executemany(
+            "UPDATE polls SET counts = ? WHERE id = ?",
+            [(json.dumps(poll_counts), poll_id) for poll_id, poll_counts in counts],
+        )
+    conn.close()
+
+
+@timed(DB_DURATION, label="query")
+def load_open_polls():
+    conn = sqlite3.connect(DB_PATH)
+    c = conn.cursor()
+    c.execute(
+        "SELECT id, guild_id, channel_id, message_id, author_id, question, options, counts, closes_at "
+        "FROM polls WHERE closed = 0"
+    )
+    polls = c.fetchall()
+    c.execute(
+        "SELECT v.poll_id, v.user_id, v.option FROM poll_votes v JOIN polls p ON p.id = v.poll_id WHERE p.closed = 0"
+    )
+    votes = c.fetchall()
+    conn.close()
+    return polls, votes
+
+
+@timed(DB_DURATION, label="query")
+@db_write
+def close_poll_row(poll_id: int) -> list[int] | None:
+    """Mark a poll closed and return its stored counts."""
+    conn = sqlite3.connect(DB_PATH)
+    c = conn.cursor()
+    c.execute("UPDATE polls SET closed = 1 WHERE id = ? AND closed = 0", (poll_id,))
+    if c.rowcount == 0:
+        conn.close()
+        return None
+    c.execute("SELECT counts FROM polls WHERE id = ?", (poll_id,))
+    counts = json.loads(c.fetchone()[0])
+    conn.commit()
+    conn.close()
+    return counts
+
+
+# ----------------- DATABASE: ROLE JOBS -----------------
+
+@timed(DB_DURATION, label="query")
+@db_write
+def create_role_job(guild_id: int, author_id: int, role_id: int, action: str, target: str, user_ids: list[int]) -> int:
+    conn = sqlite3.connect(DB_PATH)
+    with conn:
+        c = conn.cursor()
+        c.execute(
+            "INSERT INTO role_jobs (guild_id, author_id, role_id, action, target, created_at) VALUES (?, ?, ?, ?, ?, ?)",
+            (guild_id, author_id, role_id, action, target, datetime.utcnow().isoformat()),
+        )
+        job_id = c.lastrowid
+        c.executemany(
+            "INSERT OR IGNORE INTO role_job_members (job_id, user_id) VALUES (?, ?)",
+            [(job_id, user_id) for user_id in user_ids],
+        )
+    conn.close()
+    return job_id
+
+
+@timed(DB_DURATION, label="query")
+@db_write
+def record_role_job_progress(job_id: int, results: list[tuple[int, int]], finished: bool = False):
+    """Store a batch of (user_id, state) results, optionally closing the job in the same transaction."""
+    conn = sqlite3.connect(DB_PATH)
+    with conn:
+        conn.executemany(
+            "UPDATE role_job_members SET state = ? WHERE job_id = ? AND user_id = ?",
+            [(state, job_id, user_id) for user_id, state in results],
+        )
+        if finished:
+            conn.execute("UPDATE role_jobs SET finished = 1 WHERE id = ?", (job_id,))
+    conn.close()
+
+
+@timed(DB_DURATION, label="query")
+def load_role_jobs():
+    """Return unfinished jobs with their pending user IDs and per-state counts so far."""
+    conn = sqlite3.connect(DB_PATH)
+    c = conn.cursor()
+    c.execute("SELECT id, guild_id, author_id, role_id, action, target FROM role_jobs WHERE finished = 0 ORDER BY id")
+    jobs = []
+    for row in c.fetchall():
+        c.execute("SELECT user_id FROM role_job_members WHERE job_id = ? AND state = 0", (row[0],))
+        pending = [user_id for (user_id,) in c.fetchall()]
+        c.execute("SELECT state, COUNT(*) FROM role_job_members WHERE job_id = ? GROUP BY state", (row[0],))
+        jobs.append((*row, pending, dict(c.fetchall())))
+    conn.close()
+    return jobs
+
+
+# ----------------- DATABASE: ACCOUNT LINKS -----------------
+
+@dataclass
+class AccountLink:
+    discord_id: int
+    roblox_id: int
+    roblox_username: str
+    role_id: int | None
+    role_name: str | None
+    rank: int | None
+    checked_at: float
+
+    @property
+    def role(self) -> dict | None:
+        """The cached group role in the shape get_user_group_role returns."""
+        if self.role_id is None:
+            return None
+        return {"id": self.role_id, "name": self.role_name, "rank": self.rank}
+
+
+LINK_COLUMNS = "discord_id, roblox_id, roblox_username, role_id, role_name, rank, checked_at"
+
+
+@timed(DB_DURATION, label="query")
+@db_write
+def save_account_link(
+    discord_id: int,
+    roblox_id: int,
+    roblox_username: str,
+    role: dict | None,
+    linked_by: int,
+):
+    conn = sqlite3.connect(DB_PATH)
+    conn.execute(
+        f"INSERT INTO account_links ({LINK_COLUMNS}, linked_by, linked_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?) "
+        "ON CONFLICT (discord_id) DO UPDATE SET roblox_id = excluded.roblox_id, "
+        "roblox_username = excluded.roblox_username, role_id = excluded.role_id, role_name = excluded.role_name, "
+        "rank = excluded.rank, checked_at = excluded.checked_at, linked_by = excluded.linked_by, "
+        "linked_at = excluded.linked_at",
+        (
+            discord_id,
+            roblox_id,
+            roblox_username,
+            role["id"] if role else None,
+            role.get("name") if role else None,
+            role.get("rank") if role else None,
+            time.time(),
+            linked_by,
+            datetime.utcnow().isoformat(),
+        ),
+    )
+    conn.commit()
+    conn.close()
+
+
+@timed(DB_DURATION, label="query")
+@db_write
+def delete_account_link(discord_id: int) -> bool:
+    conn = sqlite3.connect(DB_PATH)
+    c = conn.cursor()
+    c.execute("DELETE FROM account_links WHERE discord_id = ?", (discord_id,))
+    deleted = c.rowcount > 0
+    conn.commit()
+    conn.close()
+    return deleted
+
+
+@timed(DB_DURATION, label="query")
+def get_account_link(discord_id: int) -> AccountLink | None:
+    conn = sqlite3.connect(DB_PATH)
+    row = conn.execute(f"SELECT {LINK_COLUMNS} FROM account_links WHERE discord_id = ?", (discord_id,)).fetchone()
+    conn.close()
+    return AccountLink(*row) if row else None
+
+
+@timed(DB_DURATION, label="query")
+def get_stale_links(checked_before: float, limit: int) -> list[AccountLink]:
+    conn = sqlite3.connect(DB_PATH)
+    rows = conn.execute(
+        f"SELECT {LINK_COLUMNS} FROM account_links WHERE checked_at < ? ORDER BY checked_at LIMIT ?",
+        (checked_before, limit),
+    ).fetchall()
+    conn.close()
+    return [AccountLink(*row) for row in rows]
+
+
+@timed(DB_DURATION, label="query")
+@db_write
+def update_link_ranks(updates: list[tuple[int, int | None, str | None, int | None, float]]):
+    """Store a batch of (discord_id, role_id, role_name, rank, checked_at) lookups."""
+    conn = sqlite3.connect(DB_PATH)
+    with conn:
+        conn.executemany(
+            "UPDATE account_links SET role_id = ?, role_name = ?, rank = ?, checked_at = ? WHERE discord_id = ?",
+            [(role_id, role_name, rank, checked_at, discord_id) for discord_id, role_id, role_name, rank, checked_at in updates],
+        )
+    conn.close()
+
+
+# ----------------- DATABASE: ANNOUNCEMENTS -----------------
+
+@timed(DB_DURATION, label="query")
+@db_write
+def create_announcement(guild_id: int, author_id: int, content: str, send_at: str, channel_ids: list[int]) -> int:
+    conn = sqlite3.connect(DB_PATH)
+    with conn:
+        c = conn.cursor()
+        c.execute(
+            "INSERT INTO announcements (guild_id, author_id, content, send_at, created_at) VALUES (?, ?, ?, ?, ?)",
+            (guild_id, author_id, content, send_at, datetime.utcnow().isoformat()),
+        )
+        announcement_id = c.lastrowid
+        c.executemany(
+            "INSERT OR IGNORE INTO announcement_deliveries (announcement_id, channel_id, next_attempt_at) "
+            "VALUES (?, ?, ?)",
+            [(announcement_id, channel_id, send_at) for channel_id in channel_ids],
+        )
+    conn.close()
+    return announcement_id
+
+
+@timed(DB_DURATION, label="query")
+def next_delivery_at() -> str | None:
+    conn = sqlite3.connect(DB_PATH)
+    row = conn.execute("SELECT MIN(next_attempt_at) FROM announcement_deliveries WHERE state = 0").fetchone()
+    conn.close()
+    return row[0]
+
+
+@timed(DB_DURATION, label="query")
+def load_due_deliveries(now: str, limit: int):
+    """(announcement_id, channel_id, attempts, content) for pending deliveries that are due."""
+    conn = sqlite3.connect(DB_PATH)
+    rows = conn.execute(
+        "SELECT d.announcement_id, d.channel_id, d.attempts, a.content FROM announcement_deliveries d "
+        "JOIN announcements a ON a.id = d.announcement_id "
+        "WHERE d.state = 0 AND d.next_attempt_at <= ? ORDER BY d.next_attempt_at LIMIT ?",
+        (now, limit),
+    ).fetchall()
+    conn.close()
+    return rows
+
+
+@timed(DB_DURATION, label="query")
+@db_write
+def record_deliveries(results: list[tuple[int, int, int, int, str, str | None]]):
+    """Store a batch of (announcement_id, channel_id, state, attempts, next_attempt_at, error)."""
+    conn = sqlite3.connect(DB_PATH)
+    with conn:
+        conn.executemany(
+            "UPDATE announcement_deliveries SET state = ?, attempts = ?, next_attempt_at = ?, error = ? "
+            "WHERE announcement_id = ? AND channel_id = ?",
+            [(state, attempts, next_at, error, ann_id, channel_id)
+             for ann_id, channel_id, state, attempts, next_at, error in results],
+        )
+    conn.close()
+
+
+# ----------------- DATABASE: ATTACHMENTS -----------------
+
+@timed(DB_DURATION, label="query")
+@db_write
+def record_attachment(
+    attachment_id: int,
+    message_id: int,
+    sha256: str,
+    filename: str,
+    content_type: str | None,
+    size: int,
+):
+    conn = sqlite3.connect(DB_PATH)
+    with conn:
+        conn.execute(
+            "INSERT INTO attachment_blobs (sha256, size, last_used) VALUES (?, ?, ?) "
+            "ON CONFLICT (sha256) DO UPDATE SET last_used = excluded.last_used",
+            (sha256, size, time.time()),
+        )
+        conn.execute(
+            "INSERT OR REPLACE INTO attachment_files (attachment_id, message_id, sha256, filename, content_type) "
+            "VALUES (?, ?, ?, ?, ?)",
+            (attachment_id, message_id, sha256, filename, content_type),
+        )
+    conn.close()
+
+
+@timed(DB_DURATION, label="query")
+def get_message_attachments(message_id: int):
+    """(attachment_id, sha256, filename, content_type) archived for a message."""
+    conn = sqlite3.connect(DB_PATH)
+    rows = conn.execute(
+        "SELECT attachment_id, sha256, filename, content_type FROM attachment_files WHERE message_id = ? "
+        "ORDER BY attachment_id",
+        (message_id,),
+    ).fetchall()
+    conn.close()
+    return rows
+
+
+@timed(DB_DURATION, label="query")
+@db_write
+def touch_attachment_blobs(shas: list[str]):
+    conn = sqlite3.connect(DB_PATH)
+    with conn:
+        now = time.time()
+        conn.executemany("UPDATE attachment_blobs SET last_used = ? WHERE sha256 = ?", [(now, sha) for sha in shas])
+    conn.close()
+
+
+@timed(DB_DURATION, label="query")
+def get_attachment_usage() -> int:
+    conn = sqlite3.connect(DB_PATH)
+    total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM attachment_blobs").fetchone()[0]
+    conn.close()
+    return total
+
+
+@timed(DB_DURATION, label="query")
+def pick_attachment_evictions(quota: int, expire_before: float) -> tuple[list[str], int]:
+    """Blobs to evict, least recently used first: every expired one, then more until usage fits ``quota``.
+
+    Returns (sha256 list, bytes remaining afterwards).
+    """
+    conn = sqlite3.connect(DB_PATH)
+    total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM attachment_blobs").fetchone()[0]
+    evict = []
+    for sha256, size, last_used in conn.execute("SELECT sha256, size, last_used FROM attachment_blobs ORDER BY last_used"):
+        if last_used >= expire_before and total <= quota:
+            break
+        evict.append(sha256)
+        total -= size
+    conn.close()
+    return evict, total
+
+
+@timed(DB_DURATION, label="query")
+@db_write
+def forget_attachment_blobs(shas: list[str]):
+    conn = sqlite3.connect(DB_PATH)
+    with conn:
+        conn.executemany("DELETE FROM attachment_files WHERE sha256 = ?", [(sha,) for sha in shas])
+        conn.executemany("DELETE FROM attachment_blobs WHERE sha256 = ?", [(sha,) for sha in shas])
+    conn.close()
+
+
+# ----------------- DATABASE: EXPORT / IMPORT / BACKUP -----------------
+
+EXPORT_COLUMNS = {
+    "cases": ("id", "guild_id", "user_id", "moderator_id", "action", "reason", "timestamp"),
+    "warnings": ("id", "guild_id", "user_id", "moderator_id", "reason", "timestamp"),
+}
+EXPORT_CHUNK = 1000      # rows fetched from the cursor at a time
+IMPORT_CHUNK = 5000      # rows per executemany / transaction
+
+
+def iter_table(table: str, guild_id: int | None = None):
+    """Yield rows of an exported table, hot and archived, in id order,
+    ``EXPORT_CHUNK`` at a time from one open cursor."""
+    column_list = ", ".join(EXPORT_COLUMNS[table])
+    source = table
+    conn = sqlite3.connect(DB_PATH)
+    if os.path.exists(ARCHIVE_DB_PATH):
+        _attach_archive(conn.cursor())
+        conn.commit()
+        source = (
+            f"(SELECT {column_list} FROM main.{table} UNION ALL "
+            f"SELECT {column_list} FROM archive.{table} WHERE id NOT IN (SELECT id FROM main.{table}))"
+        )
+    query = f"SELECT {column_list} FROM {source}"
+    params = ()
+    if guild_id is not None:
+        query += " WHERE guild_id = ?"
+        params = (guild_id,)
+    try:
+        c = conn.execute(query + " ORDER BY id", params)
+        while rows := c.fetchmany(EXPORT_CHUNK):
+            yield from rows
+    finally:
+        conn.close()
+
+
+@timed(DB_DURATION, label="query")
+def export_table(table: str, fileobj, fmt: str = "csv", guild_id: int | None = None, compress: bool = True) -> int:
+    """Stream ``table`` into a binary file object as CSV or JSON lines; returns the row count."""
+    columns = EXPORT_COLUMNS[table]
+    raw = gzip.GzipFile(fileobj=fileobj, mode="wb") if compress else fileobj
+    out = io.TextIOWrapper(raw, encoding="utf-8", newline="")
+    count = 0
+    if fmt == "csv":
+        writer = csv.writer(out)
+        writer.writerow(columns)
+        for row in iter_table(table, guild_id):
+            writer.writerow(row)
+            count += 1
+    else:
+        for row in iter_table(table, guild_id):
+            out.write(json.dumps(dict(zip(columns, row)), separators=(",", ":")) + "\n")
+            count += 1
+    out.flush()
+    out.detach()
+    if compress:
+        raw.close()     # writes the gzip trailer; leaves fileobj open
+    return count
+
+
+def _read_export(fileobj, fmt: str, columns: tuple[str, ...]):
+    if fmt == "csv":
+        reader = csv.reader(fileobj)
+        header = next(reader, None)
+        if header and tuple(header) != columns:
+            raise ValueError(f"unexpected CSV header {header}")
+        for row in reader:
+            # csv has no NULL: empty optional values come back as ""
+            yield tuple(value if value != "" else None for value in row)
+    else:
+        for line in fileobj:
+            if line.strip():
+                record = json.loads(line)
+                yield tuple(record.get(column) for column in columns)
+
+
+@timed(DB_DURATION, label="query")
+def import_table(table: str, path: str, fmt: str | None = None) -> int:
+    """Bulk load an export file back into ``table``; rows whose id already exists,
+    hot or archived, are skipped.
+
+    Runs against DB_PATH directly rather than through the writer process:
+    the rows come from a file on this machine and WAL mode lets it share
+    the database with a running bot.
+    """
+    columns = EXPORT_COLUMNS[table]
+    fmt = fmt or ("jsonl" if ".jsonl" in path else "csv")
+    opener = gzip.open if path.endswith(".gz") else open
+    query = f"INSERT OR IGNORE INTO {table} ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})"
+
+    conn = sqlite3.connect(DB_PATH, timeout=30)
+    archived = False
+    if os.path.exists(ARCHIVE_DB_PATH):
+        # An archived case re-imported into the hot table would show up twice.
+        _attach_archive(conn.cursor())
+        conn.commit()
+        archived = True
+        query = (
+            f"INSERT OR IGNORE INTO {table} ({', '.join(columns)}) SELECT {', '.join('?' * len(columns))} "
+            f"WHERE NOT EXISTS (SELECT 1 FROM archive.{table} WHERE id = CAST(? AS INTEGER))"
+        )
+    total = 0
+    with opener(path, "rt", encoding="utf-8", newline="") as f:
+        rows = _read_export(f, fmt, columns)
+        while chunk := [row for _, row in zip(range(IMPORT_CHUNK), rows)]:
+            if archived:
+                chunk = [row + (row[0],) for row in chunk]
+            with conn:
+                total += conn.executemany(query, chunk).rowcount
+    if table == "cases" and total:
+        with conn:
+            _rebuild_daily_stats(conn.cursor())
+    conn.close()
+    return total
+
+
+def archive_backup_path(dest: str) -> str:
+    root, ext = os.path.splitext(dest)
+    return f"{root}.archive{ext or '.db'}"
+
+
+def _backup_file(path: str, dest: str):
+    source = sqlite3.connect(path)
+    target = sqlite3.connect(dest)
+    try:
+        source.backup(target, pages=-1)
+    finally:
+        target.close()
+        source.close()
+
+
+@timed(DB_DURATION, label="query")
+def backup_db(dest: str) -> list[str]:
+    """Online copy of DB_PATH to ``dest`` with SQLite's backup API.
+
+    Copied in a single step: in WAL mode that only holds a read snapshot,
+    so writers are never blocked, whereas a stepped backup restarts each
+    time another connection writes and may never finish on a busy
+    database. The archive database, if there is one, goes next to it (see
+    archive_backup_path). Returns the files written.
+    """
+    _backup_file(DB_PATH, dest)
+    written = [dest]
+    if os.path.exists(ARCHIVE_DB_PATH):
+        _backup_file(ARCHIVE_DB_PATH, archive_backup_path(dest))
+        written.append(archive_backup_path(dest))
+    return written
+
 # ----------------- HELPERS -----------------
 import aiohttp
 import os
 
 ROBLOX_GROUP_ID = 299952594
 ROBLOX_API_KEY = os.getenv("Pizza")  # updated key name
+ROBLOX_BASE = "https://apis.roblox.com"
+ROBLOX_USERS_API = "https://users.roblox.com/v1/usernames/users"
+ROBLOX_GROUPS_API = "https://groups.roblox.com/v1"
+
+# One connection pool for every outbound HTTP call (Roblox, attachment
+# downloads); created on first use inside the running loop, closed in close().
+http_session: aiohttp.ClientSession | None = None
+
+
+def get_http_session() -> aiohttp.ClientSession:
+    global http_session
+    if http_session is None or http_session.closed:
+        http_session = aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=30))
+    return http_session
 
 
 async def get_roblox_user_id(username: str):
-    print("DEBUG: async get_roblox_user_id is running")
-    url = "https://users.roblox.com/v1/usernames/users"
+    log.debug("Resolving Roblox username %r", username)
+    url = ROBLOX_USERS_API
     payload = {"usernames": [username], "excludeBannedUsers": False}
 
-    async with aiohttp.ClientSession() as session:
-        async with session.post(url, json=payload) as r:
-            if r.status != 200:
-                return None
-            data = await r.json()
-            if not data.get("data"):
-                return None
-            return data["data"][0]["id"]
+    session = get_http_session()
+    started = time.perf_counter()
+    async with session.post(url, json=payload) as r:
+        ROBLOX_LATENCY.observe(time.perf_counter() - started, endpoint="usernames", status=r.status)
+        if r.status != 200:
+            return None
+        data = await r.json()
+        if not data.get("data"):
+            return None
+        return data["data"][0]["id"]
+
+
+async def get_group_roles():
+    url = f"{ROBLOX_GROUPS_API}/groups/{ROBLOX_GROUP_ID}/roles"
+
+    session = get_http_session()
+    started = time.perf_counter()
+    async with session.get(url) as r:
+        ROBLOX_LATENCY.observe(time.perf_counter() - started, endpoint="group_roles", status=r.status)
+        if r.status != 200:
+            return None
+        data = await r.json()
+        return data.get("roles", [])
+
+
+async def get_user_group_role(user_id: int):
+    return (await fetch_user_group_role(user_id))[1]
+
+
+async def fetch_user_group_role(user_id: int) -> tuple[bool, dict | None]:
+    """(looked up, group role); the role is None both when the user is not in
+    the group and when the lookup failed, which the first item tells apart."""
+    url = f"{ROBLOX_GROUPS_API}/users/{user_id}/groups/roles"
+
+    session = get_http_session()
+    started = time.perf_counter()
+    async with session.get(url) as r:
+        ROBLOX_LATENCY.observe(time.perf_counter() - started, endpoint="user_group_roles", status=r.status)
+        if r.status != 200:
+            log.debug("Roblox group role lookup for %s returned HTTP %s", user_id, r.status)
+            return False, None
+
+        data = await r.json()
+        log.debug("Roblox group roles for %s: %s", user_id, data)
+
+        # The endpoint wraps memberships in {"data": [...]}
+        if isinstance(data, dict):
+            data = data.get("data")
+        if not isinstance(data, list):
+            return False, None
+
+        for entry in data:
+            if not isinstance(entry, dict):
+                continue
+
+            group = entry.get("group")
+            if isinstance(group, dict) and group.get("id") == ROBLOX_GROUP_ID:
+                return True, entry.get("role")
+
+        return True, None
+
 
+async def set_user_rank(user_id: int, role_id: int):
+    url = f"{ROBLOX_GROUPS_API}/groups/{ROBLOX_GROUP_ID}/users/{user_id}"
+    payload = {"roleId": role_id}
+    headers = {"x-api-key": ROBLOX_API_KEY, "Content-Type": "application/json"}
+
+    session = get_http_session()
+    started = time.perf_counter()
+    async with session.patch(url, json=payload, headers=headers) as r:
+        ROBLOX_LATENCY.observe(time.perf_counter() - started, endpoint="set_rank", status=r.status)
+        return r.status == 200
+
+
+GROUP_ROLES_TTL = 10 * 60    # the group's rank ladder rarely changes
+RANK_TTL = 15 * 60           # how long a linked account's cached rank is trusted
+
+group_roles_cache: tuple[float, list] | None = None
+
+
+async def get_group_roles_cached():
+    global group_roles_cache
+    if group_roles_cache and time.monotonic() - group_roles_cache[0] < GROUP_ROLES_TTL:
+        return group_roles_cache[1]
+    roles = await get_group_roles()
+    if roles:
+        group_roles_cache = (time.monotonic(), roles)
+    return roles
+
+
+def rank_update(discord_id: int, role: dict | None) -> tuple:
+    if role is None:
+        return (discord_id, None, None, None, time.time())
+    return (discord_id, role.get("id"), role.get("name"), role.get("rank"), time.time())
+
+
+async def get_linked_group_role(link: AccountLink) -> dict | None:
+    # Only a positive result is served from cache, so someone who just
+    # joined the group is not told otherwise for RANK_TTL.
+    if link.role is not None and time.time() - link.checked_at < RANK_TTL:
+        return link.role
+    ok, role = await fetch_user_group_role(link.roblox_id)
+    if ok:
+        await asyncio.to_thread(update_link_ranks, [rank_update(link.discord_id, role)])
+    return role
+
+# --------------
+
+
+def get_log_channel(guild: discord.Guild):
+    return discord.utils.get(guild.channels, name=get_guild_config(guild.id).log_channel_name)
+
+
+# ----------------- DURATIONS -----------------
+
+MAX_TIMEOUT = timedelta(days=28)    # Discord rejects longer communication timeouts
+
+DURATION_UNITS = {
+    name: seconds
+    for seconds, names in (
+        (604800, ("w", "wk", "wks", "week", "weeks")),
+        (86400, ("d", "day", "days")),
+        (3600, ("h", "hr", "hrs", "hour", "hours")),
+        (60, ("m", "min", "mins", "minute", "minutes")),
+        (1, ("s", "sec", "secs", "second", "seconds")),
+    )
+    for name in names
+}
+
+# One "<number> <unit>" part, optionally followed by a separator: "1h30m", "1 day, 6 hours".
+DURATION_PART = re.compile(r"(\d{1,7})\s*([a-z]+)(?:\s*,\s*|\s+and\s+|\s*)")
+DURATION_PRESETS = ("60s", "5m", "10m", "30m", "1h", "6h", "12h", "1d", "3d", "1w", "2w", "28d")
+
+
+@functools.lru_cache(maxsize=1024)
+def parse_duration(duration: str) -> timedelta | None:
+    """Parse ``10m``, ``1h30m`` or ``1 day 6 hours``; None if malformed or zero."""
+    text = duration.lower().strip()
+    total = 0
+    pos = 0
+    while pos < len(text):
+        match = DURATION_PART.match(text, pos)
+        if not match or match.group(2) not in DURATION_UNITS:
+            return None
+        total += int(match.group(1)) * DURATION_UNITS[match.group(2)]
+        pos = match.end()
+    if not total:
+        return None
+    return timedelta(seconds=total)
+
+
+def format_duration(delta: timedelta) -> str:
+    seconds = int(delta.total_seconds())
+    parts = []
+    for name, size in (("week", 604800), ("day", 86400), ("hour", 3600), ("minute", 60), ("second", 1)):
+        count, seconds = divmod(seconds, size)
+        if count:
+            parts.append(f"{count} {name}" + ("s" if count != 1 else ""))
+    return " ".join(parts) or "0 seconds"
+
+
+@functools.lru_cache(maxsize=512)
+def duration_choices(current: str, limit: timedelta | None) -> tuple[tuple[str, str], ...]:
+    """Autocomplete suggestions for what has been typed so far, as (label, value)."""
+    current = current.lower().strip()
+    candidates = []
+    if current[-1:].isdigit():
+        candidates.extend(current + unit for unit in ("m", "h", "d", "s"))
+    elif current:
+        candidates.append(current)
+    candidates.extend(preset for preset in DURATION_PRESETS if preset.startswith(current))
+
+    choices = []
+    for value in dict.fromkeys(candidates):
+        delta = parse_duration(value)
+        if delta is None or (limit is not None and delta > limit):
+            continue
+        choices.append((f"{value} ({format_duration(delta)})"[:100], value[:100]))
+    return tuple(choices[:25])
+
+
+async def duration_autocomplete(interaction: discord.Interaction, current: str) -> list[app_commands.Choice[str]]:
+    limit = MAX_TIMEOUT if interaction.command and interaction.command.name == "timeout" else None
+    return [app_commands.Choice(name=name, value=value) for name, value in duration_choices(current[:50], limit)]
+
+
+async def send_dm(user: discord.User, embed: discord.Embed) -> bool:
+    try:
+        await user.send(embed=embed)
+    except discord.HTTPException as e:
+        log.warning("Could not DM %s (%s): %s", user, user.id, e)
+        return False
+    return True
+
+
+async def send_log(guild: discord.Guild, embed: discord.Embed):
+    log_channel = get_log_channel(guild)
+    if log_channel:
+        await log_channel.send(embed=embed)
+        LOG_SENDS.inc(shard=guild.shard_id)
+
+
+# ----------------- PERMISSIONS -----------------
+
+class Tier(IntEnum):
+    NONE = 0
+    HELPER = 1
+    MOD = 2      # the configured staff role
+    ADMIN = 3
+    OWNER = 4
+
+
+# guild_id -> {member_id: Tier}. Dropped per member from on_member_update /
+# on_member_remove and per guild whenever that guild's config is written.
+permission_cache: dict[int, dict[int, Tier]] = {}
+
+
+def resolve_tier(member: discord.Member) -> Tier:
+    if member.id == OWNER_ID or member.id == member.guild.owner_id:
+        return Tier.OWNER
+
+    config = get_guild_config(member.guild.id)
+    # Member._roles is the raw sorted role-ID list discord.py keeps for each
+    # member; .has() is a binary search, unlike member.roles which builds and
+    # sorts a list of Role objects on every access.
+    roles = member._roles
+    if (config.admin_role_id and roles.has(config.admin_role_id)) or member.guild_permissions.administrator:
+        return Tier.ADMIN
+    if config.staff_role_id and roles.has(config.staff_role_id):
+        return Tier.MOD
+    if config.helper_role_id and roles.has(config.helper_role_id):
+        return Tier.HELPER
+    return Tier.NONE
+
+
+def get_tier(member: discord.Member) -> Tier:
+    guild_cache = permission_cache.setdefault(member.guild.id, {})
+    tier = guild_cache.get(member.id)
+    if tier is None:
+        tier = guild_cache[member.id] = resolve_tier(member)
+    return tier
+
+
+def invalidate_permissions(guild_id: int, member_id: int | None = None):
+    if member_id is None:
+        permission_cache.pop(guild_id, None)
+    else:
+        permission_cache.get(guild_id, {}).pop(member_id, None)
+
+
+def require(tier: Tier):
+    async def predicate(interaction: discord.Interaction) -> bool:
+        if interaction.guild is None:
+            return False
+        member = interaction.user
+        if not isinstance(member, discord.Member):
+            return False
+        return get_tier(member) >= tier
+    return app_commands.check(predicate)
+
+
+def staff_only():
+    return require(Tier.MOD)
+
+
+# ----------------- BACKGROUND TASKS -----------------
+
+# Strong references to fire-and-forget tasks, so they are not garbage
+# collected mid-flight and their failures get reported.
+background_tasks: set[asyncio.Task] = set()
+
+
+def _on_background_task_done(task: asyncio.Task):
+    background_tasks.discard(task)
+    if task.cancelled():
+        return
+    exc = task.exception()
+    if exc is not None:
+        log.error("Background task %s failed", task.get_name(), exc_info=exc)
+
+
+REGISTRY.gauge("bluehorizon_background_tasks", "In-flight background tasks.", lambda: len(background_tasks))
+
+
+def spawn(coro, name: str | None = None) -> asyncio.Task:
+    task = asyncio.create_task(coro, name=name)
+    background_tasks.add(task)
+    task.add_done_callback(_on_background_task_done)
+    return task
+
+
+async def run_side_effects(label: str, *coros):
+    results = await asyncio.gather(*coros, return_exceptions=True)
+    for result in results:
+        if isinstance(result, BaseException):
+            log.warning("%s: side effect failed", label, exc_info=result)
+
+
+# ----------------- EVENT DEDUPLICATION -----------------
+
+EVENT_DEDUP_SIZE = 4096     # event keys remembered
+EVENT_DEDUP_TTL = 300       # seconds a key suppresses repeats; replays land well inside this
+
+EVENTS_DEDUPLICATED = REGISTRY.counter(
+    "bluehorizon_events_deduplicated_total",
+    "Gateway events dropped as replays of one already handled.",
+    ("event",),
+)
+
+
+class RecentEvents:
+    """Bounded LRU of recently handled event keys, each valid for ``ttl`` seconds."""
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._seen: OrderedDict[str, float] = OrderedDict()
+
+    def check(self, key: str) -> bool:
+        """True if ``key`` was handled within the TTL; otherwise remember it and return False."""
+        now = time.time()
+        seen_at = self._seen.get(key)
+        if seen_at is not None and now - seen_at < self.ttl:
+            return True
+        self._seen[key] = now
+        self._seen.move_to_end(key)
+        if len(self._seen) > self.maxsize:
+            self._seen.popitem(last=False)
+        return False
+
+    def dump(self) -> str:
+        return json.dumps(list(self._seen.items()))
+
+    def load(self, data: str | None):
+        # Wall-clock timestamps, so keys saved at shutdown still cover a
+        # quick restart and expire normally otherwise.
+        if not data:
+            return
+        cutoff = time.time() - self.ttl
+        for key, seen_at in json.loads(data)[-self.maxsize:]:
+            if seen_at >= cutoff:
+                self._seen[key] = seen_at
 
-async def get_group_roles():
-    url = f"https://groups.roblox.com/v1/groups/{ROBLOX_GROUP_ID}/roles"
 
-    async with aiohttp.ClientSession() as session:
-        async with session.get(url) as r:
-            if r.status != 200:
-                return None
-            data = await r.json()
-            return data.get("roles", [])
+recent_events = RecentEvents(EVENT_DEDUP_SIZE, EVENT_DEDUP_TTL)
 
 
-async def get_user_group_role(user_id: int):
-    url = f"https://groups.roblox.com/v1/users/{user_id}/groups/roles"
+def dedupe(key: Callable[..., tuple]):
+    """Drop an event handler call whose ``key(*args)`` was handled recently."""
+    def decorator(fn):
+        name = fn.__name__
 
-    async with aiohttp.ClientSession() as session:
-        async with session.get(url) as r:
-            if r.status != 200:
-                print("DEBUG STATUS:", r.status)
+        @functools.wraps(fn)
+        async def wrapper(*args):
+            if recent_events.check(":".join(map(str, (name, *key(*args))))):
+                EVENTS_DEDUPLICATED.inc(event=name)
                 return None
+            return await fn(*args)
+        return wrapper
 
-            data = await r.json()
-            print("DEBUG GROUP ROLE RESPONSE:", data)  # <--- ADD THIS
+    return decorator
 
-            if not isinstance(data, list):
-                return None
 
-            for entry in data:
-                if not isinstance(entry, dict):
-                    continue
+# ----------------- MODERATION ACTIONS -----------------
 
-                group = entry.get("group")
-                if isinstance(group, dict) and group.get("id") == ROBLOX_GROUP_ID:
-                    return entry.get("role")
+@dataclass(frozen=True)
+class ModAction:
+    key: str                    # stored as cases.action
+    color: discord.Color
+    dm_title: str               # "You have been banned"
+    log_title: str              # "User Banned" -> "User Banned | Case #12"
+    confirmation: str           # formatted with user, case_id, warning_id and any fields
+    apply: Callable[..., Awaitable[None]] | None = None
+    records_warning: bool = False
 
-            return None
 
+MOD_ACTIONS: dict[str, ModAction] = {}
+# (dm template, log template) per action, built once at registration
+MOD_EMBED_TEMPLATES: dict[str, tuple[EmbedTemplate, EmbedTemplate]] = {}
 
-async def set_user_rank(user_id: int, role_id: int):
-    url = f"https://groups.roblox.com/v1/groups/{ROBLOX_GROUP_ID}/users/{user_id}"
-    payload = {"roleId": role_id}
-    headers = {"x-api-key": ROBLOX_API_KEY, "Content-Type": "application/json"}
 
-    async with aiohttp.ClientSession() as session:
-        async with session.patch(url, json=payload, headers=headers) as r:
-            return r.status == 200
+def register_action(action: ModAction) -> ModAction:
+    MOD_ACTIONS[action.key] = action
+    MOD_EMBED_TEMPLATES[action.key] = (
+        EmbedTemplate(action.dm_title, color=action.color),
+        EmbedTemplate(color=action.color),
+    )
+    return action
 
-# --------------
 
+def _record_timing(key: str, phase: str, started: float):
+    MOD_ACTION_PHASE.observe(time.perf_counter() - started, action=key, phase=phase)
 
-def get_log_channel(guild: discord.Guild):
-    return discord.utils.get(guild.channels, name=LOG_CHANNEL_NAME)
 
+async def execute_mod_action(
+    interaction: discord.Interaction,
+    key: str,
+    user: discord.Member,
+    reason: str,
+    *,
+    fields: dict[str, str] | None = None,
+    **params,
+):
+    """Single executor behind every moderation command.
 
-def parse_duration(duration: str) -> timedelta | None:
-    match = re.fullmatch(r"(\d+)([smhdw])", duration.lower().strip())
-    if not match:
-        return None
+    The interaction is deferred before anything else so slow Discord or
+    database calls cannot push us past the 3 second response deadline.
+    The case (and warning) rows are written in one transaction off the
+    event loop, the moderator gets the follow-up, and the DM and log
+    delivery run concurrently in a tracked background task.
+    """
+    action = MOD_ACTIONS[key]
+    fields = fields or {}
 
-    value = int(match.group(1))
-    unit = match.group(2)
+    await interaction.response.defer(ephemeral=True)
 
-    if unit == "s":
-        return timedelta(seconds=value)
-    if unit == "m":
-        return timedelta(minutes=value)
-    if unit == "h":
-        return timedelta(hours=value)
-    if unit == "d":
-        return timedelta(days=value)
-    if unit == "w":
-        return timedelta(weeks=value)
-    return None
+    if action.apply is not None:
+        started = time.perf_counter()
+        try:
+            await action.apply(interaction, user, reason, **params)
+        except discord.Forbidden:
+            await interaction.followup.send(f"I don't have permission to {key} that user.", ephemeral=True)
+            return
+        except discord.HTTPException as e:
+            log.warning("%s on %s failed: %s", key, user.id, e)
+            await interaction.followup.send(f"Discord rejected the {key}: {e.text or e.status}", ephemeral=True)
+            return
+        finally:
+            _record_timing(key, "apply", started)
 
+    case_reason = reason
+    if fields:
+        details = ", ".join(f"{name.lower()}: {value}" for name, value in fields.items())
+        case_reason = f"{reason} ({details})"
 
-async def send_dm(user: discord.User, embed: discord.Embed):
+    started = time.perf_counter()
     try:
-        await user.send(embed=embed)
-    except:
-        pass
+        case_id, warning_id = await asyncio.to_thread(
+            record_case, interaction.guild.id, user.id, interaction.user.id, key, case_reason, action.records_warning
+        )
+    except (sqlite3.Error, WriterError, OSError):
+        log.exception("Recording %s case for %s failed", key, user.id)
+        if action.apply is not None:
+            message = f"The {key} was applied, but the case could not be recorded."
+        else:
+            message = f"Could not record the {key}; nothing was changed."
+        await interaction.followup.send(message, ephemeral=True)
+        return
+    finally:
+        _record_timing(key, "db", started)
 
+    await interaction.followup.send(
+        action.confirmation.format(user=user.mention, case_id=case_id, warning_id=warning_id, **fields),
+        ephemeral=True
+    )
 
-def staff_only():
-    async def predicate(interaction: discord.Interaction) -> bool:
-        if interaction.guild is None:
-            return False
-        member = interaction.user
-        if not isinstance(member, discord.Member):
-            return False
-        return any(role.id == STAFF_ROLE_ID for role in member.roles)
-    return app_commands.check(predicate)
+    detail_fields = list(fields.items())
+    id_fields = [("Case ID", str(case_id))]
+    if warning_id is not None:
+        id_fields.append(("Warning ID", str(warning_id)))
+
+    dm_template, log_template = MOD_EMBED_TEMPLATES[key]
+    dm_embed = dm_template.embed(extra_fields=detail_fields + [("Reason", reason)] + id_fields)
+    log_embed = log_template.embed(
+        title=f"{action.log_title} | Case #{case_id}",
+        extra_fields=[("User", f"{user} ({user.mention})"), ("Moderator", interaction.user.mention)]
+        + detail_fields
+        + [("Reason", reason)]
+        + id_fields[1:],
+    )
+
+    async def deliver():
+        started = time.perf_counter()
+        await run_side_effects(
+            f"{key} {user.id}",
+            send_dm(user, dm_embed),
+            send_log(interaction.guild, log_embed),
+        )
+        _record_timing(key, "delivery", started)
+
+    spawn(deliver(), name=f"{key}-side-effects")
+
+
+async def _apply_timeout(interaction, user, reason, *, delta: timedelta):
+    await user.timeout(delta, reason=reason)
+
+
+async def _apply_untimeout(interaction, user, reason):
+    await user.timeout(None, reason=reason)
+
+
+async def _apply_ban(interaction, user, reason):
+    await interaction.guild.ban(user, reason=reason, delete_message_days=0)
+
+
+async def _apply_softban(interaction, user, reason):
+    await interaction.guild.ban(user, reason=reason, delete_message_days=1)
+    await interaction.guild.unban(user, reason=f"Softban: {reason}")
+
+
+async def _apply_kick(interaction, user, reason):
+    await user.kick(reason=reason)
+
+
+register_action(ModAction(
+    key="timeout",
+    color=discord.Color.dark_grey(),
+    dm_title="You have been timed out",
+    log_title="User Timed Out",
+    confirmation="{user} has been timed out for `{Duration}`. Case `#{case_id}`.",
+    apply=_apply_timeout,
+))
+register_action(ModAction(
+    key="untimeout",
+    color=discord.Color.blue(),
+    dm_title="Your timeout has been removed",
+    log_title="Timeout Removed",
+    confirmation="Timeout removed from {user}. Case `#{case_id}`.",
+    apply=_apply_untimeout,
+))
+register_action(ModAction(
+    key="ban",
+    color=discord.Color.red(),
+    dm_title="You have been banned",
+    log_title="User Banned",
+    confirmation="{user} has been banned. Case `#{case_id}`.",
+    apply=_apply_ban,
+))
+register_action(ModAction(
+    key="softban",
+    color=discord.Color.dark_orange(),
+    dm_title="You have been softbanned",
+    log_title="User Softbanned",
+    confirmation="{user} has been softbanned. Case `#{case_id}`.",
+    apply=_apply_softban,
+))
+register_action(ModAction(
+    key="kick",
+    color=discord.Color.orange(),
+    dm_title="You have been kicked",
+    log_title="User Kicked",
+    confirmation="{user} has been kicked. Case `#{case_id}`.",
+    apply=_apply_kick,
+))
+register_action(ModAction(
+    key="warn",
+    color=discord.Color.gold(),
+    dm_title="You have received a warning",
+    log_title="User Warned",
+    confirmation="{user} has been warned. Case `#{case_id}`, Warning `#{warning_id}`.",
+    records_warning=True,
+))
+
+
+# ----------------- ATTACHMENT ARCHIVE -----------------
+
+ATTACHMENT_CONCURRENCY = 3               # downloads in flight
+ATTACHMENT_EVICT_INTERVAL = 60 * 60      # seconds between age-based eviction passes
+
+attachment_store = AttachmentStore(ATTACHMENT_ARCHIVE_DIR) if ATTACHMENT_ARCHIVE_DIR else None
+attachment_semaphore = asyncio.Semaphore(ATTACHMENT_CONCURRENCY)
+attachment_usage: int | None = None      # bytes on disk, loaded on first use
+last_attachment_eviction = 0.0
+
+
+async def archive_attachments(message: discord.Message):
+    global attachment_usage
+    if attachment_usage is None:
+        attachment_usage = await asyncio.to_thread(get_attachment_usage)
+
+    for attachment in message.attachments:
+        if attachment.size > ATTACHMENT_MAX_BYTES:
+            continue
+        async with attachment_semaphore:
+            try:
+                async with get_http_session().get(attachment.url) as r:
+                    if r.status != 200:
+                        log.debug("Attachment %s download returned HTTP %s", attachment.id, r.status)
+                        continue
+                    data = await r.read()
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                log.debug("Attachment %s download failed: %s", attachment.id, e)
+                continue
+            sha256, created = await asyncio.to_thread(attachment_store.put, data)
+        await asyncio.to_thread(
+            record_attachment,
+            attachment.id,
+            message.id,
+            sha256,
+            attachment.filename,
+            attachment.content_type,
+            len(data),
+        )
+        if created:
+            attachment_usage += len(data)
+
+    if attachment_usage > ATTACHMENT_QUOTA_BYTES or time.monotonic() - last_attachment_eviction > ATTACHMENT_EVICT_INTERVAL:
+        await evict_attachments()
+
+
+async def evict_attachments():
+    global attachment_usage, last_attachment_eviction
+    last_attachment_eviction = time.monotonic()
+    expire_before = time.time() - ATTACHMENT_MAX_AGE_DAYS * 86400
+    shas, attachment_usage = await asyncio.to_thread(pick_attachment_evictions, ATTACHMENT_QUOTA_BYTES, expire_before)
+    if not shas:
+        return
+    # Files first: a crash in between leaves rows pointing at missing files,
+    # which load_archived_files skips, rather than untracked files on disk.
+    await asyncio.to_thread(lambda: [attachment_store.remove(sha) for sha in shas])
+    await asyncio.to_thread(forget_attachment_blobs, shas)
+    log.info("Evicted %s archived attachment(s)", len(shas))
+
+
+async def load_archived_files(message: discord.Message, max_bytes: int) -> list[tuple[int, discord.File, bool]]:
+    """(attachment_id, file, is_image) for the archived attachments of a deleted message,
+    as many as fit in one upload of ``max_bytes``."""
+    rows = await asyncio.to_thread(get_message_attachments, message.id)
+    files = []
+    used = []
+    total = 0
+    for attachment_id, sha256, filename, content_type in rows[:10]:
+        if not attachment_store.exists(sha256):
+            continue
+        size = os.path.getsize(attachment_store.path(sha256))
+        if total + size > max_bytes:
+            continue    # left as a link in the embed
+        total += size
+        file = discord.File(attachment_store.path(sha256), filename=f"{len(files)}-{filename}")
+        files.append((attachment_id, file, bool(content_type and content_type.startswith("image/"))))
+        used.append(sha256)
+    if used:
+        await asyncio.to_thread(touch_attachment_blobs, used)
+    return files
 
 
 # ----------------- EVENTS -----------------
 
 @bot.event
+@timed(EVENT_DURATION, label="event")
 async def on_ready():
-    init_db()
-    guild = discord.Object(id=GUILD_ID)
-    await tree.sync(guild=guild)
-    print(f"Blue Horizon is online as {bot.user} | Slash commands synced.")
+    log.info("Blue Horizon is online as %s", bot.user)
+
+
+@bot.event
+async def on_app_command_completion(interaction: discord.Interaction, command):
+    observe_command(interaction, "ok")
+
+
+@tree.error
+async def on_app_command_error(interaction: discord.Interaction, error: app_commands.AppCommandError):
+    observe_command(interaction, "error")
+    name = interaction.command.qualified_name if interaction.command else "unknown"
+    if isinstance(error, app_commands.CheckFailure):
+        log.info("User %s failed the check for /%s", interaction.user.id, name)
+        return
+    log.error("Command /%s failed", name, exc_info=error)
 
 
 @bot.event
+@dedupe(lambda message: (message.id,))
+@timed(EVENT_DURATION, label="event")
 async def on_message(message: discord.Message):
     if message.author.bot:
         return
 
+    if attachment_store is not None and message.guild and message.attachments:
+        spawn(archive_attachments(message), name=f"archive-attachments-{message.id}")
+
     # Ignore replies completely
     if message.reference is not None:
         await bot.process_commands(message)
         return
 
     # ----------------- OWNERSHIP PING PROTECTION -----------------
-    ownership_ids = {650411480017141770, 797497654451765279, 1190692291535446156}
+    ownership_ids = get_guild_config(message.guild.id).ownership_ids if message.guild else OWNERSHIP_IDS
     mentioned_ids = {user.id for user in message.mentions}
 
     if ownership_ids.intersection(mentioned_ids):
@@ -256,18 +2083,159 @@ async def on_message(message: discord.Message):
         await message.channel.send(embed=embed)
 
     await bot.process_commands(message)
-# ---------------- ban -------------------
-ROBLOX_BASE = "https://apis.roblox.com"
-ROBLOX_USERS_API = "https://users.roblox.com/v1/usernames/users"
-ROBLOX_GROUPS_API = "https://groups.roblox.com/v1"
 
 
 # ----------------- LOGGING EVENTS -----------------
 
 TARGET_USER_ID = OWNER_ID  # forward deleted log messages to you
+FORWARD_BATCH_DELAY = 2    # seconds to collect deleted log embeds into one DM
+
+# Static embed parts for every log event, built once at import.
+MESSAGE_DELETED = EmbedTemplate("Message Deleted", color=discord.Color.red(), fields=("Channel", "Content"))
+MESSAGE_EDITED = EmbedTemplate("Message Edited", color=discord.Color.orange(), fields=("Channel", "Before", "After"))
+MEMBER_JOINED = EmbedTemplate("Member Joined", color=discord.Color.green())
+MEMBER_LEFT = EmbedTemplate("Member Left", color=discord.Color.dark_red())
+CHANNEL_CREATED = EmbedTemplate("Channel Created", color=discord.Color.green())
+CHANNEL_DELETED = EmbedTemplate("Channel Deleted", color=discord.Color.dark_red())
+ROLE_ASSIGNED = EmbedTemplate("Role Assigned", color=discord.Color.green(), fields=("User", "Role"))
+ROLE_REMOVED = EmbedTemplate("Role Removed", color=discord.Color.red(), fields=("User", "Role"))
+ROLE_UPDATED = EmbedTemplate("Role Updated", color=discord.Color.blurple(), fields=("User", "Role", "Action", "Moderator"))
+BETA_GRANTED = EmbedTemplate("Beta Access Granted", color=discord.Color.blurple(), fields=("User", "Granted By", "Role"))
+MESSAGES_PURGED = EmbedTemplate("Messages Purged", color=discord.Color.dark_red(), fields=("Moderator", "Channel", "Amount"))
+LOG_TAMPERED = EmbedTemplate(
+    "Log Channel Tampered",
+    color=discord.Color.dark_red(),
+    fields=("Channel", "Messages Deleted", "Archived"),
+    footer="Archived messages are attached as gzipped JSON lines.",
+)
+BULK_ROLE_UPDATED = EmbedTemplate(
+    color=discord.Color.blurple(),
+    fields=("Role", "Action", "Target", "Moderator", "Changed", "Skipped", "Failed"),
+)
+
+
+owner_dm: discord.DMChannel | None = None
+forward_queue: list[discord.Embed] = []
+forward_task: asyncio.Task | None = None
+owner_dm_lock = asyncio.Lock()
+# log channel ID -> bulk deletes not yet reported; a purge of more than 100
+# messages arrives as several events and should raise a single alert.
+tamper_queue: dict[int, list[discord.RawBulkMessageDeleteEvent]] = {}
+tamper_task: asyncio.Task | None = None
+
+
+async def get_owner_dm() -> discord.DMChannel:
+    global owner_dm
+    if owner_dm is None:
+        async with owner_dm_lock:
+            if owner_dm is None:
+                user = bot.get_user(TARGET_USER_ID) or await bot.fetch_user(TARGET_USER_ID)
+                owner_dm = await user.create_dm()
+    return owner_dm
+
+
+def forward_to_owner(*embeds: discord.Embed):
+    global forward_task
+    forward_queue.extend(embeds)
+    if forward_task is None or forward_task.done():
+        forward_task = spawn(_flush_forwards_later(), name="forward-deleted-logs")
+
+
+async def _flush_forwards_later():
+    await asyncio.sleep(FORWARD_BATCH_DELAY)
+    await flush_forwards()
+
+
+def _next_forward_batch() -> list[discord.Embed]:
+    # Discord allows 10 embeds and 6000 embed characters per message.
+    size = 0
+    count = 0
+    for embed in forward_queue[:10]:
+        size += len(embed)
+        if count and size > 6000:
+            break
+        count += 1
+    batch = forward_queue[:count]
+    del forward_queue[:count]
+    return batch
+
+
+async def flush_forwards():
+    if not forward_queue:
+        return
+    channel = await get_owner_dm()
+    while forward_queue:
+        batch = _next_forward_batch()
+        try:
+            await channel.send(embeds=batch)
+        except discord.HTTPException as e:
+            if e.status < 500:
+                # Rejected outright; resending the same payload would fail forever.
+                log.warning("Discord rejected %s forwarded log(s): %s", len(batch), e)
+                continue
+            # Back at the front for the next flush instead of dropped.
+            forward_queue[:0] = batch
+            raise
+        except (aiohttp.ClientError, asyncio.TimeoutError):
+            forward_queue[:0] = batch
+            raise
+
+
+def queue_tamper_alert(payload: discord.RawBulkMessageDeleteEvent):
+    global tamper_task
+    tamper_queue.setdefault(payload.channel_id, []).append(payload)
+    if tamper_task is None or tamper_task.done():
+        tamper_task = spawn(_flush_tamper_alerts_later(), name="log-tamper-alert")
+
+
+async def _flush_tamper_alerts_later():
+    await asyncio.sleep(FORWARD_BATCH_DELAY)
+    await flush_tamper_alerts()
+
+
+async def flush_tamper_alerts():
+    while tamper_queue:
+        channel_id, payloads = tamper_queue.popitem()
+        embed = LOG_TAMPERED.embed(
+            f"<#{channel_id}>",
+            str(sum(len(payload.message_ids) for payload in payloads)),
+            str(sum(len(payload.cached_messages) for payload in payloads)),
+        )
+        archive = discord.File(build_log_archive(payloads), filename=f"deleted-logs-{channel_id}.jsonl.gz")
+        try:
+            await (await get_owner_dm()).send(embed=embed, file=archive)
+        except discord.HTTPException as e:
+            log.warning("Could not send log tamper alert: %s", e)
+
+
+def build_log_archive(payloads: list[discord.RawBulkMessageDeleteEvent]) -> io.BytesIO:
+    """Gzipped JSON lines: one record per deleted message, full content only for cached ones."""
+    cached = {message.id: message for payload in payloads for message in payload.cached_messages}
+    lines = []
+    for message_id in sorted(set().union(*(payload.message_ids for payload in payloads))):
+        message = cached.get(message_id)
+        record = {"id": message_id}
+        if message is not None:
+            record.update(
+                author_id=message.author.id,
+                created_at=message.created_at.isoformat(),
+                content=message.content,
+                embeds=[
+                    {
+                        "title": embed.title,
+                        "description": embed.description,
+                        "fields": [[f.name, f.value] for f in embed.fields],
+                    }
+                    for embed in message.embeds
+                ],
+            )
+        lines.append(json.dumps(record, separators=(",", ":")))
+    return io.BytesIO(gzip.compress("\n".join(lines).encode()))
 
 
 @bot.event
+@dedupe(lambda message: (message.id,))
+@timed(EVENT_DURATION, label="event")
 async def on_message_delete(message: discord.Message):
     if not message.guild:
         return
@@ -278,50 +2246,78 @@ async def on_message_delete(message: discord.Message):
 
     # If the deleted message was a LOG MESSAGE posted by the bot → forward it
     if message.channel.id == log_channel.id and message.author.id == bot.user.id:
-        try:
-            target = await message.guild.fetch_member(TARGET_USER_ID)
-
-            if message.embeds:
-                for embed in message.embeds:
-                    forwarded = embed.copy()
-                    forwarded.title = "A Log Message Was Deleted"
-                    await target.send(embed=forwarded)
-
-            if message.content:
-                await target.send(
-                    f"A log message was deleted in {log_channel.mention}:\n\n{message.content}"
-                )
-
-        except Exception as e:
-            print(f"Could not forward deleted log: {e}")
-
+        forwarded = []
+        for embed in message.embeds:
+            copy = embed.copy()
+            copy.title = "A Log Message Was Deleted"
+            forwarded.append(copy)
+
+        if message.content:
+            forwarded.append(discord.Embed(
+                title="A Log Message Was Deleted",
+                description=f"In {log_channel.mention}:\n\n{message.content}",
+                color=discord.Color.dark_red()
+            ))
+
+        forward_to_owner(*forwarded)
         return
 
     if message.author.bot:
         return
 
-    embed = discord.Embed(
-        title="Message Deleted",
-        description=f"Message by {message.author.mention} was deleted",
-        color=discord.Color.red(),
-        timestamp=datetime.utcnow()
-    )
+    def build_embed(archived: list[tuple[int, discord.File, bool]]):
+        extra_fields = None
+        image = None
+        if message.attachments:
+            archived_ids = {attachment_id for attachment_id, _, _ in archived}
+            extra_fields = [("Attachments", "\n".join(
+                f"{a.filename} (archived, attached)" if a.id in archived_ids else a.url for a in message.attachments
+            ))]
+            images = [file for _, file, is_image in archived if is_image]
+            # CDN links die with the message; point the embed at the re-uploaded copy when there is one.
+            image = f"attachment://{images[0].filename}" if images else message.attachments[0].url
+        return MESSAGE_DELETED.embed(
+            message.channel.mention,
+            message.content or "No text",
+            description=f"Message by {message.author.mention} was deleted",
+            thumbnail=message.author.avatar.url if message.author.avatar else None,
+            image=image,
+            extra_fields=extra_fields,
+        )
 
-    embed.add_field(name="Channel", value=message.channel.mention, inline=False)
-    embed.add_field(name="Content", value=message.content or "No text", inline=False)
+    archived = []
+    if message.attachments and attachment_store is not None:
+        archived = await load_archived_files(message, message.guild.filesize_limit)
+    if not archived:
+        await log_channel.send(embed=build_embed([]))
+        return
+    try:
+        await log_channel.send(embed=build_embed(archived), files=[file for _, file, _ in archived])
+    except discord.HTTPException as e:
+        # The upload was refused (size, rate); the log entry itself still goes out.
+        log.warning("Re-uploading attachments of deleted message %s failed: %s", message.id, e)
+        await log_channel.send(embed=build_embed([]))
 
-    if message.attachments:
-        urls = "\n".join(a.url for a in message.attachments)
-        embed.add_field(name="Attachments", value=urls, inline=False)
-        embed.set_image(url=message.attachments[0].url)
 
-    if message.author.avatar:
-        embed.set_thumbnail(url=message.author.avatar.url)
+@bot.event
+@dedupe(lambda payload: (payload.channel_id, min(payload.message_ids), len(payload.message_ids)))
+@timed(EVENT_DURATION, label="event")
+async def on_raw_bulk_message_delete(payload: discord.RawBulkMessageDeleteEvent):
+    guild = bot.get_guild(payload.guild_id) if payload.guild_id else None
+    if guild is None:
+        return
 
-    await log_channel.send(embed=embed)
+    log_channel = get_log_channel(guild)
+    if not log_channel or payload.channel_id != log_channel.id:
+        return
+
+    # One alert for the whole purge instead of a DM per deleted log message.
+    queue_tamper_alert(payload)
 
 
 @bot.event
+@dedupe(lambda before, after: (after.id, after.edited_at))
+@timed(EVENT_DURATION, label="event")
 async def on_message_edit(before: discord.Message, after: discord.Message):
     if before.author.bot or not before.guild:
         return
@@ -332,107 +2328,95 @@ async def on_message_edit(before: discord.Message, after: discord.Message):
     if not log_channel:
         return
 
-    embed = discord.Embed(
-        title="Message Edited",
-        description=f"{before.author.mention} edited a message",
-        color=discord.Color.orange(),
-        timestamp=datetime.utcnow()
-    )
-
-    embed.add_field(name="Channel", value=before.channel.mention, inline=False)
-    embed.add_field(name="Before", value=before.content or "No text", inline=False)
-    embed.add_field(name="After", value=after.content or "No text", inline=False)
-
+    extra_fields = []
+    image = None
     if before.attachments:
-        urls = "\n".join(a.url for a in before.attachments)
-        embed.add_field(name="Old Attachments", value=urls, inline=False)
-
+        extra_fields.append(("Old Attachments", "\n".join(a.url for a in before.attachments)))
     if after.attachments:
-        urls = "\n".join(a.url for a in after.attachments)
-        embed.add_field(name="New Attachments", value=urls, inline=False)
-        embed.set_image(url=after.attachments[0].url)
+        extra_fields.append(("New Attachments", "\n".join(a.url for a in after.attachments)))
+        image = after.attachments[0].url
 
-    if before.author.avatar:
-        embed.set_thumbnail(url=before.author.avatar.url)
+    embed = MESSAGE_EDITED.embed(
+        before.channel.mention,
+        before.content or "No text",
+        after.content or "No text",
+        description=f"{before.author.mention} edited a message",
+        thumbnail=before.author.avatar.url if before.author.avatar else None,
+        image=image,
+        extra_fields=extra_fields,
+    )
 
     await log_channel.send(embed=embed)
 
 
 @bot.event
+@dedupe(lambda member: (member.guild.id, member.id, member.joined_at))
+@timed(EVENT_DURATION, label="event")
 async def on_member_join(member: discord.Member):
     log_channel = get_log_channel(member.guild)
     if not log_channel:
         return
 
-    embed = discord.Embed(
-        title="Member Joined",
+    embed = MEMBER_JOINED.embed(
         description=f"{member.mention} joined the server",
-        color=discord.Color.green(),
-        timestamp=datetime.utcnow()
+        thumbnail=member.avatar.url if member.avatar else None,
     )
 
-    if member.avatar:
-        embed.set_thumbnail(url=member.avatar.url)
-
     await log_channel.send(embed=embed)
 
 
 @bot.event
+@dedupe(lambda member: (member.guild.id, member.id, member.joined_at))
+@timed(EVENT_DURATION, label="event")
 async def on_member_remove(member: discord.Member):
+    invalidate_permissions(member.guild.id, member.id)
+
     log_channel = get_log_channel(member.guild)
     if not log_channel:
         return
 
-    embed = discord.Embed(
-        title="Member Left",
+    embed = MEMBER_LEFT.embed(
         description=f"{member} left the server",
-        color=discord.Color.dark_red(),
-        timestamp=datetime.utcnow()
+        thumbnail=member.avatar.url if member.avatar else None,
     )
 
-    if member.avatar:
-        embed.set_thumbnail(url=member.avatar.url)
-
     await log_channel.send(embed=embed)
 
 
 @bot.event
+@dedupe(lambda channel: (channel.id,))
+@timed(EVENT_DURATION, label="event")
 async def on_guild_channel_create(channel: discord.abc.GuildChannel):
     log_channel = get_log_channel(channel.guild)
     if not log_channel:
         return
 
-    embed = discord.Embed(
-        title="Channel Created",
-        description=f"{channel.mention} was created",
-        color=discord.Color.green(),
-        timestamp=datetime.utcnow()
-    )
+    embed = CHANNEL_CREATED.embed(description=f"{channel.mention} was created")
 
     await log_channel.send(embed=embed)
 
 
 @bot.event
+@dedupe(lambda channel: (channel.id,))
+@timed(EVENT_DURATION, label="event")
 async def on_guild_channel_delete(channel: discord.abc.GuildChannel):
     log_channel = get_log_channel(channel.guild)
     if not log_channel:
         return
 
-    embed = discord.Embed(
-        title="Channel Deleted",
-        description=f"{channel.name} was deleted",
-        color=discord.Color.dark_red(),
-        timestamp=datetime.utcnow()
-    )
+    embed = CHANNEL_DELETED.embed(description=f"{channel.name} was deleted")
 
     await log_channel.send(embed=embed)
 
 
 @bot.event
+@timed(EVENT_DURATION, label="event")
 async def on_member_update(before: discord.Member, after: discord.Member):
-    if before.roles == after.roles:
+    if before._roles == after._roles:
         return
 
+    invalidate_permissions(after.guild.id, after.id)
+
     log_channel = get_log_channel(after.guild)
     if not log_channel:
         return
@@ -447,13 +2431,7 @@ async def on_member_update(before: discord.Member, after: discord.Member):
         if role.is_default():
             continue
 
-        embed = discord.Embed(
-            title="Role Assigned",
-            color=discord.Color.green(),
-            timestamp=datetime.utcnow()
-        )
-        embed.add_field(name="User", value=after.mention, inline=False)
-        embed.add_field(name="Role", value=role.mention, inline=False)
+        embed = ROLE_ASSIGNED.embed(after.mention, role.mention)
 
         await log_channel.send(embed=embed)
 
@@ -461,36 +2439,44 @@ async def on_member_update(before: discord.Member, after: discord.Member):
         if role.is_default():
             continue
 
-        embed = discord.Embed(
-            title="Role Removed",
-            color=discord.Color.red(),
-            timestamp=datetime.utcnow()
-        )
-        embed.add_field(name="User", value=after.mention, inline=False)
-        embed.add_field(name="Role", value=role.mention, inline=False)
+        embed = ROLE_REMOVED.embed(after.mention, role.mention)
 
         await log_channel.send(embed=embed)
 
 
+@bot.listen("on_guild_role_update")
+async def on_role_permissions_change(before: discord.Role, after: discord.Role):
+    # The administrator permission feeds Tier.ADMIN, so a change to it can
+    # move any member holding the role.
+    if before.permissions.administrator != after.permissions.administrator:
+        invalidate_permissions(after.guild.id)
+
+
+@bot.listen("on_guild_role_delete")
+async def on_role_delete(role: discord.Role):
+    invalidate_permissions(role.guild.id)
+
+
 # ----------------- SLASH COMMANDS -----------------
 
-guild_obj = discord.Object(id=GUILD_ID)
+guild_obj = discord.Object(id=GUILD_ID)  # home guild
 
 
-@tree.command(name="ping", description="Check if the bot is alive.", guild=guild_obj)
+@tree.command(name="ping", description="Check if the bot is alive.")
 async def ping(interaction: discord.Interaction):
     await interaction.response.send_message("Pong.", ephemeral=True)
 
 
 # ----------------- MODERATION: TIMEOUT -----------------
 
-@tree.command(name="timeout", description="Timeout a member for a duration.", guild=guild_obj)
+@tree.command(name="timeout", description="Timeout a member for a duration.")
 @staff_only()
 @app_commands.describe(
     user="User to timeout",
-    duration="Duration (e.g. 10m, 2h, 1d, 1w, 30s)",
+    duration="Duration, up to 28 days (e.g. 10m, 1h30m, 1 day 6 hours)",
     reason="Reason for the timeout"
 )
+@app_commands.autocomplete(duration=duration_autocomplete)
 async def timeout(
     interaction: discord.Interaction,
     user: discord.Member,
@@ -500,51 +2486,23 @@ async def timeout(
     delta = parse_duration(duration)
     if not delta:
         await interaction.response.send_message(
-            "Invalid duration. Use one unit: `Xs`, `Xm`, `Xh`, `Xd`, `Xw`.",
+            "Invalid duration. Combine `s`, `m`, `h`, `d`, `w` parts, e.g. `1h30m` or `1 day 6 hours`.",
             ephemeral=True
         )
         return
-
-    try:
-        await user.timeout(delta, reason=reason)
-    except discord.Forbidden:
-        await interaction.response.send_message("I don't have permission to timeout that user.", ephemeral=True)
-        return
-
-    case_id = add_case(user.id, interaction.user.id, "timeout", f"{reason} (duration: {duration})")
-
-    dm_embed = discord.Embed(
-        title="You have been timed out",
-        color=discord.Color.dark_grey(),
-        timestamp=datetime.utcnow()
-    )
-    dm_embed.add_field(name="Duration", value=duration, inline=False)
-    dm_embed.add_field(name="Reason", value=reason, inline=False)
-    dm_embed.add_field(name="Case ID", value=str(case_id), inline=False)
-    await send_dm(user, dm_embed)
-
-    log_channel = get_log_channel(interaction.guild)
-    if log_channel:
-        embed = discord.Embed(
-            title=f"User Timed Out | Case #{case_id}",
-            color=discord.Color.dark_grey(),
-            timestamp=datetime.utcnow()
+    if delta > MAX_TIMEOUT:
+        await interaction.response.send_message(
+            "Timeouts can be at most 28 days.",
+            ephemeral=True
         )
-        embed.add_field(name="User", value=f"{user} ({user.mention})", inline=False)
-        embed.add_field(name="Moderator", value=interaction.user.mention, inline=False)
-        embed.add_field(name="Duration", value=duration, inline=False)
-        embed.add_field(name="Reason", value=reason, inline=False)
-        await log_channel.send(embed=embed)
+        return
 
-    await interaction.response.send_message(
-        f"{user.mention} has been timed out for `{duration}`. Case `#{case_id}`.",
-        ephemeral=True
-    )
+    await execute_mod_action(interaction, "timeout", user, reason, fields={"Duration": duration}, delta=delta)
 
 
 # ----------------- MODERATION: UNTIMEOUT -----------------
 
-@tree.command(name="untimeout", description="Remove timeout from a member.", guild=guild_obj)
+@tree.command(name="untimeout", description="Remove timeout from a member.")
 @staff_only()
 @app_commands.describe(
     user="User to remove timeout from",
@@ -555,44 +2513,12 @@ async def untimeout(
     user: discord.Member,
     reason: str = "No reason provided"
 ):
-    try:
-        await user.timeout(None, reason=reason)
-    except discord.Forbidden:
-        await interaction.response.send_message("I don't have permission to untimeout that user.", ephemeral=True)
-        return
-
-    case_id = add_case(user.id, interaction.user.id, "untimeout", reason)
-
-    dm_embed = discord.Embed(
-        title="Your timeout has been removed",
-        color=discord.Color.blue(),
-        timestamp=datetime.utcnow()
-    )
-    dm_embed.add_field(name="Reason", value=reason, inline=False)
-    dm_embed.add_field(name="Case ID", value=str(case_id), inline=False)
-    await send_dm(user, dm_embed)
-
-    log_channel = get_log_channel(interaction.guild)
-    if log_channel:
-        embed = discord.Embed(
-            title=f"Timeout Removed | Case #{case_id}",
-            color=discord.Color.blue(),
-            timestamp=datetime.utcnow()
-        )
-        embed.add_field(name="User", value=f"{user} ({user.mention})", inline=False)
-        embed.add_field(name="Moderator", value=interaction.user.mention, inline=False)
-        embed.add_field(name="Reason", value=reason, inline=False)
-        await log_channel.send(embed=embed)
-
-    await interaction.response.send_message(
-        f"Timeout removed from {user.mention}. Case `#{case_id}`.",
-        ephemeral=True
-    )
+    await execute_mod_action(interaction, "untimeout", user, reason)
 
 
 # ----------------- MODERATION: BAN -----------------
 
-@tree.command(name="ban", description="Ban a member.", guild=guild_obj)
+@tree.command(name="ban", description="Ban a member.")
 @staff_only()
 @app_commands.describe(
     user="User to ban",
@@ -603,44 +2529,28 @@ async def ban(
     user: discord.Member,
     reason: str = "No reason provided"
 ):
-    try:
-        await interaction.guild.ban(user, reason=reason, delete_message_days=0)
-    except discord.Forbidden:
-        await interaction.response.send_message("I don't have permission to ban that user.", ephemeral=True)
-        return
-
-    case_id = add_case(user.id, interaction.user.id, "ban", reason)
+    await execute_mod_action(interaction, "ban", user, reason)
 
-    dm_embed = discord.Embed(
-        title="You have been banned",
-        color=discord.Color.red(),
-        timestamp=datetime.utcnow()
-    )
-    dm_embed.add_field(name="Reason", value=reason, inline=False)
-    dm_embed.add_field(name="Case ID", value=str(case_id), inline=False)
-    await send_dm(user, dm_embed)
 
-    log_channel = get_log_channel(interaction.guild)
-    if log_channel:
-        embed = discord.Embed(
-            title=f"User Banned | Case #{case_id}",
-            color=discord.Color.red(),
-            timestamp=datetime.utcnow()
-        )
-        embed.add_field(name="User", value=f"{user} ({user.mention})", inline=False)
-        embed.add_field(name="Moderator", value=interaction.user.mention, inline=False)
-        embed.add_field(name="Reason", value=reason, inline=False)
-        await log_channel.send(embed=embed)
+# ----------------- MODERATION: SOFTBAN -----------------
 
-    await interaction.response.send_message(
-        f"{user.mention} has been banned. Case `#{case_id}`.",
-        ephemeral=True
-    )
+@tree.command(name="softban", description="Ban and immediately unban a member to clear their recent messages.")
+@staff_only()
+@app_commands.describe(
+    user="User to softban",
+    reason="Reason for the softban"
+)
+async def softban(
+    interaction: discord.Interaction,
+    user: discord.Member,
+    reason: str = "No reason provided"
+):
+    await execute_mod_action(interaction, "softban", user, reason)
 
 
 # ----------------- MODERATION: KICK -----------------
 
-@tree.command(name="kick", description="Kick a member.", guild=guild_obj)
+@tree.command(name="kick", description="Kick a member.")
 @staff_only()
 @app_commands.describe(
     user="User to kick",
@@ -651,44 +2561,12 @@ async def kick(
     user: discord.Member,
     reason: str = "No reason provided"
 ):
-    try:
-        await user.kick(reason=reason)
-    except discord.Forbidden:
-        await interaction.response.send_message("I don't have permission to kick that user.", ephemeral=True)
-        return
-
-    case_id = add_case(user.id, interaction.user.id, "kick", reason)
-
-    dm_embed = discord.Embed(
-        title="You have been kicked",
-        color=discord.Color.orange(),
-        timestamp=datetime.utcnow()
-    )
-    dm_embed.add_field(name="Reason", value=reason, inline=False)
-    dm_embed.add_field(name="Case ID", value=str(case_id), inline=False)
-    await send_dm(user, dm_embed)
-
-    log_channel = get_log_channel(interaction.guild)
-    if log_channel:
-        embed = discord.Embed(
-            title=f"User Kicked | Case #{case_id}",
-            color=discord.Color.orange(),
-            timestamp=datetime.utcnow()
-        )
-        embed.add_field(name="User", value=f"{user} ({user.mention})", inline=False)
-        embed.add_field(name="Moderator", value=interaction.user.mention, inline=False)
-        embed.add_field(name="Reason", value=reason, inline=False)
-        await log_channel.send(embed=embed)
-
-    await interaction.response.send_message(
-        f"{user.mention} has been kicked. Case `#{case_id}`.",
-        ephemeral=True
-    )
+    await execute_mod_action(interaction, "kick", user, reason)
 
 
 # ----------------- MODERATION: WARN -----------------
 
-@tree.command(name="warn", description="Warn a member.", guild=guild_obj)
+@tree.command(name="warn", description="Warn a member.")
 @staff_only()
 @app_commands.describe(
     user="User to warn",
@@ -699,53 +2577,26 @@ async def warn(
     user: discord.Member,
     reason: str = "No reason provided"
 ):
-    warning_id = add_warning(user.id, interaction.user.id, reason)
-    case_id = add_case(user.id, interaction.user.id, "warn", reason)
-
-    dm_embed = discord.Embed(
-        title="You have received a warning",
-        color=discord.Color.gold(),
-        timestamp=datetime.utcnow()
-    )
-    dm_embed.add_field(name="Reason", value=reason, inline=False)
-    dm_embed.add_field(name="Case ID", value=str(case_id), inline=False)
-    dm_embed.add_field(name="Warning ID", value=str(warning_id), inline=False)
-    await send_dm(user, dm_embed)
-
-    log_channel = get_log_channel(interaction.guild)
-    if log_channel:
-        embed = discord.Embed(
-            title=f"User Warned | Case #{case_id}",
-            color=discord.Color.gold(),
-            timestamp=datetime.utcnow()
-        )
-        embed.add_field(name="User", value=f"{user} ({user.mention})", inline=False)
-        embed.add_field(name="Moderator", value=interaction.user.mention, inline=False)
-        embed.add_field(name="Reason", value=reason, inline=False)
-        embed.add_field(name="Warning ID", value=str(warning_id), inline=False)
-        await log_channel.send(embed=embed)
-
-    await interaction.response.send_message(
-        f"{user.mention} has been warned. Case `#{case_id}`, Warning `#{warning_id}`.",
-        ephemeral=True
-    )
+    await execute_mod_action(interaction, "warn", user, reason)
 
 
 # ----------------- MODERATION: HISTORY -----------------
 
-@tree.command(name="history", description="View a user's moderation history.", guild=guild_obj)
-@staff_only()
+@tree.command(name="history", description="View a user's moderation history.")
+@require(Tier.HELPER)
 @app_commands.describe(
-    user="User to view history for"
+    user="User to view history for",
+    page="Page of 10 cases, newest first"
 )
 async def history(
     interaction: discord.Interaction,
-    user: discord.Member
+    user: discord.Member,
+    page: app_commands.Range[int, 1] = 1
 ):
-    rows = get_history(user.id, limit=10)
+    rows = await asyncio.to_thread(get_history, interaction.guild.id, user.id, 10, (page - 1) * 10)
     if not rows:
         await interaction.response.send_message(
-            f"No moderation history found for {user.mention}.",
+            f"No moderation history found for {user.mention}" + (f" on page {page}." if page > 1 else "."),
             ephemeral=True
         )
         return
@@ -755,6 +2606,7 @@ async def history(
         color=discord.Color.blurple(),
         timestamp=datetime.utcnow()
     )
+    embed.set_footer(text=f"Page {page}")
 
     for case_id, action, reason, mod_id, ts in rows:
         embed.add_field(
@@ -768,30 +2620,18 @@ async def history(
 
 # ----------------- MODERATION: REVOKE CASE -----------------
 
-@tree.command(name="revoke", description="Revoke a specific moderation case.", guild=guild_obj)
+@tree.command(name="revoke", description="Revoke a specific moderation case.")
 @staff_only()
 @app_commands.describe(
     case_id="The case ID to revoke"
 )
 async def revoke(interaction: discord.Interaction, case_id: int):
-    conn = sqlite3.connect(DB_PATH)
-    c = conn.cursor()
-
-    c.execute("SELECT user_id, action, reason FROM cases WHERE id = ?", (case_id,))
-    row = c.fetchone()
-
-    if not row:
-        await interaction.response.send_message("Case not found.", ephemeral=True)
-        conn.close()
+    await interaction.response.defer(ephemeral=True)
+    if not await asyncio.to_thread(revoke_case, interaction.guild.id, case_id):
+        await interaction.followup.send("Case not found.", ephemeral=True)
         return
 
-    user_id, action, reason = row
-
-    c.execute("DELETE FROM cases WHERE id = ?", (case_id,))
-    conn.commit()
-    conn.close()
-
-    await interaction.response.send_message(
+    await interaction.followup.send(
         f"Case #{case_id} has been revoked.",
         ephemeral=True
     )
@@ -799,40 +2639,256 @@ async def revoke(interaction: discord.Interaction, case_id: int):
 
 # ----------------- MODERATION: CLEAR HISTORY -----------------
 
-@tree.command(name="clearhistory", description="Clear all moderation history for a user.", guild=guild_obj)
+@tree.command(name="clearhistory", description="Clear all moderation history for a user.")
 @staff_only()
 @app_commands.describe(
     user="User whose history will be cleared"
 )
 async def clearhistory(interaction: discord.Interaction, user: discord.Member):
-    conn = sqlite3.connect(DB_PATH)
-    c = conn.cursor()
-
-    c.execute("DELETE FROM cases WHERE user_id = ?", (user.id,))
-    conn.commit()
-    conn.close()
+    await interaction.response.defer(ephemeral=True)
+    await asyncio.to_thread(clear_history, interaction.guild.id, user.id)
 
-    await interaction.response.send_message(
+    await interaction.followup.send(
         f"All moderation history for {user.mention} has been cleared.",
         ephemeral=True
     )
 
 
-# ----------------- POLL -----------------
+# ----------------- POLL -----------------
+
+POLL_EMOJIS = ["🅰️", "🅱️", "🇨", "🇩", "🇪", "🇫", "🇬", "🇭", "🇮", "🇯"]
+POLL_FLUSH_INTERVAL = 5      # seconds between vote batches written to SQLite
+POLL_RENDER_DELAY = 3        # debounce window for live result edits
+POLL_CLOSE_RETRY = 30        # seconds before retrying a scheduled close that failed
+
+
+@dataclass
+class PollState:
+    id: int
+    channel_id: int
+    message_id: int | None
+    author: str
+    question: str
+    options: list[str]
+    counts: list[int]
+    closes_at: datetime | None
+    votes: dict[int, int] = field(default_factory=dict)      # user_id -> option
+    pending: dict[int, int] = field(default_factory=dict)    # votes not yet flushed
+    render_task: asyncio.Task | None = None
+    close_task: asyncio.Task | None = None
+    closing: bool = False        # final flush under way; further votes would not be stored
+
+
+open_polls: dict[int, PollState] = {}
+poll_flush_task: asyncio.Task | None = None
+
+REGISTRY.gauge(
+    "bluehorizon_poll_pending_votes",
+    "Poll votes waiting to be flushed to SQLite.",
+    lambda: sum(len(p.pending) for p in open_polls.values()),
+)
+
+
+def build_poll_embed(state: PollState, final: bool = False) -> discord.Embed:
+    total = sum(state.counts)
+    embed = discord.Embed(
+        title="Poll Results" if final else "Poll",
+        description=state.question,
+        color=discord.Color.dark_grey() if final else discord.Color.blurple(),
+        timestamp=discord.utils.utcnow()
+    )
+
+    lines = []
+    for i, option in enumerate(state.options):
+        count = state.counts[i]
+        share = count / total if total else 0
+        bar = "█" * round(share * 10) + "░" * (10 - round(share * 10))
+        lines.append(f"{POLL_EMOJIS[i]} — {option}\n`{bar}` **{count}** ({share:.0%})")
+    embed.add_field(name="Results" if final else "Options", value="\n".join(lines), inline=False)
+
+    if final:
+        top = max(state.counts)
+        winners = [state.options[i] for i, count in enumerate(state.counts) if count == top and top]
+        embed.add_field(name="Winner", value=", ".join(winners) or "No votes", inline=False)
+    elif state.closes_at:
+        embed.add_field(name="Closes", value=discord.utils.format_dt(state.closes_at, "R"), inline=False)
+
+    embed.set_footer(text=f"Poll #{state.id} by {state.author} • {total} vote{'s' if total != 1 else ''}")
+    return embed
+
+
+def build_poll_view(state: PollState) -> discord.ui.View:
+    view = discord.ui.View(timeout=None)
+    for i, option in enumerate(state.options):
+        view.add_item(discord.ui.Button(
+            label=option[:80],
+            emoji=POLL_EMOJIS[i],
+            style=discord.ButtonStyle.secondary,
+            custom_id=f"poll:{state.id}:{i}",
+        ))
+    return view
+
+
+def poll_message(state: PollState) -> discord.PartialMessage:
+    return bot.get_partial_messageable(state.channel_id).get_partial_message(state.message_id)
+
+
+def schedule_poll_render(state: PollState):
+    if state.render_task is None or state.render_task.done():
+        state.render_task = spawn(_render_poll_later(state), name=f"poll-render-{state.id}")
+
+
+async def _render_poll_later(state: PollState):
+    await asyncio.sleep(POLL_RENDER_DELAY)
+    if state.id in open_polls:
+        await poll_message(state).edit(embed=build_poll_embed(state))
+
+
+async def flush_polls():
+    votes = []
+    counts = []
+    taken = []
+    for state in open_polls.values():
+        if state.pending:
+            votes.extend((state.id, user_id, option) for user_id, option in state.pending.items())
+            counts.append((state.id, list(state.counts)))
+            taken.append((state, state.pending))
+            state.pending = {}
+    if not votes:
+        return
+    try:
+        await asyncio.to_thread(flush_poll_votes, votes, counts)
+    except BaseException:
+        # Put the batch back so the next flush retries it; a vote changed
+        # while the write was in flight keeps its newer option.
+        for state, pending in taken:
+            state.pending = pending | state.pending
+        raise
+
+
+async def _poll_flush_loop():
+    while True:
+        await asyncio.sleep(POLL_FLUSH_INTERVAL)
+        try:
+            await flush_polls()
+        except Exception:
+            log.exception("Flushing poll votes failed")
+
+
+async def close_poll(poll_id: int):
+    state = open_polls.get(poll_id)
+    if state is None:
+        return False
+
+    state.closing = True
+    try:
+        await flush_polls()
+        counts = await asyncio.to_thread(close_poll_row, poll_id)
+    except BaseException:
+        state.closing = False
+        raise
+    open_polls.pop(poll_id, None)
+    if counts is None:
+        return False
+
+    if state.render_task and not state.render_task.done():
+        state.render_task.cancel()
+    state.counts = counts
+    try:
+        await poll_message(state).edit(embed=build_poll_embed(state, final=True), view=None)
+    except discord.HTTPException as e:
+        log.warning("Could not post final results for poll #%s: %s", poll_id, e)
+    return True
+
+
+async def _close_poll_at(state: PollState):
+    await discord.utils.sleep_until(state.closes_at)
+    # Not a spawned task, so nothing else would see a failure here.
+    while state.id in open_polls:
+        try:
+            await close_poll(state.id)
+            return
+        except Exception:
+            log.exception("Closing poll #%s failed; retrying in %ss", state.id, POLL_CLOSE_RETRY)
+            await asyncio.sleep(POLL_CLOSE_RETRY)
+
+
+def track_poll(state: PollState):
+    global poll_flush_task
+    open_polls[state.id] = state
+    if state.closes_at:
+        # Not spawned: this can sleep for days, and the shutdown drain waits
+        # for spawned tasks. restore_polls re-arms it after a restart.
+        state.close_task = asyncio.create_task(_close_poll_at(state), name=f"poll-close-{state.id}")
+    if poll_flush_task is None or poll_flush_task.done():
+        poll_flush_task = asyncio.create_task(_poll_flush_loop(), name="poll-flush")
+
+
+async def restore_polls():
+    polls, votes = await asyncio.to_thread(load_open_polls)
+    for poll_id, guild_id, channel_id, message_id, author_id, question, options, counts, closes_at in polls:
+        if message_id is None or not owns_guild(guild_id):
+            continue
+        track_poll(PollState(
+            id=poll_id,
+            channel_id=channel_id,
+            message_id=message_id,
+            author=str(bot.get_user(author_id) or author_id),
+            question=question,
+            options=json.loads(options),
+            counts=json.loads(counts),
+            closes_at=datetime.fromisoformat(closes_at) if closes_at else None,
+        ))
+    for poll_id, user_id, option in votes:
+        if poll_id in open_polls:
+            open_polls[poll_id].votes[user_id] = option
+    if open_polls:
+        log.info("Restored %s open poll(s)", len(open_polls))
+
+
+@bot.listen("on_interaction")
+async def on_poll_vote(interaction: discord.Interaction):
+    if interaction.type is not discord.InteractionType.component:
+        return
+    custom_id = (interaction.data or {}).get("custom_id", "")
+    if not custom_id.startswith("poll:"):
+        return
+
+    _, poll_id, option = custom_id.split(":")
+    state = open_polls.get(int(poll_id))
+    if state is None or state.closing:
+        await interaction.response.send_message("This poll is closed.", ephemeral=True)
+        return
+
+    option = int(option)
+    previous = state.votes.get(interaction.user.id)
+    if previous == option:
+        await interaction.response.send_message(f"You already voted for **{state.options[option]}**.", ephemeral=True)
+        return
+
+    if previous is not None:
+        state.counts[previous] -= 1
+    state.counts[option] += 1
+    state.votes[interaction.user.id] = option
+    state.pending[interaction.user.id] = option
 
-POLL_EMOJIS = ["🅰️", "🅱️", "🇨", "🇩", "🇪", "🇫", "🇬", "🇭", "🇮", "🇯"]
+    await interaction.response.send_message(f"Vote recorded for **{state.options[option]}**.", ephemeral=True)
+    schedule_poll_render(state)
 
 
-@tree.command(name="poll", description="Create a reaction-based poll.", guild=guild_obj)
+@tree.command(name="poll", description="Create a button-based poll.")
 @staff_only()
 @app_commands.describe(
     question="The poll question",
-    options="Comma-separated options (max 10)"
+    options="Comma-separated options (max 10)",
+    duration="Close the poll automatically after this long (e.g. 1h, 2d, 1 day 12 hours)"
 )
+@app_commands.autocomplete(duration=duration_autocomplete)
 async def poll(
     interaction: discord.Interaction,
     question: str,
-    options: str
+    options: str,
+    duration: str | None = None
 ):
     opts = [o.strip() for o in options.split(",") if o.strip()]
     if len(opts) < 2:
@@ -848,50 +2904,214 @@ async def poll(
         )
         return
 
-    embed = discord.Embed(
-        title="Poll",
-        description=question,
-        color=discord.Color.blurple(),
-        timestamp=datetime.utcnow()
+    closes_at = None
+    if duration:
+        delta = parse_duration(duration)
+        if not delta:
+            await interaction.response.send_message(
+                "Invalid duration. Combine `s`, `m`, `h`, `d`, `w` parts, e.g. `1h30m` or `1 day 6 hours`.",
+                ephemeral=True
+            )
+            return
+        closes_at = discord.utils.utcnow() + delta
+
+    await interaction.response.send_message("Poll created.", ephemeral=True)
+
+    poll_id = await asyncio.to_thread(
+        create_poll,
+        interaction.guild.id,
+        interaction.channel.id,
+        interaction.user.id,
+        question,
+        opts,
+        closes_at.isoformat() if closes_at else None,
+    )
+    state = PollState(
+        id=poll_id,
+        channel_id=interaction.channel.id,
+        message_id=None,
+        author=str(interaction.user),
+        question=question,
+        options=opts,
+        counts=[0] * len(opts),
+        closes_at=closes_at,
     )
 
-    desc_lines = []
-    for i, option in enumerate(opts):
-        desc_lines.append(f"{POLL_EMOJIS[i]} — {option}")
-    embed.add_field(name="Options", value="\n".join(desc_lines), inline=False)
-    embed.set_footer(text=f"Poll by {interaction.user}", icon_url=interaction.user.display_avatar.url)
+    msg = await interaction.channel.send(embed=build_poll_embed(state), view=build_poll_view(state))
+    state.message_id = msg.id
+    await asyncio.to_thread(set_poll_message, poll_id, msg.id)
+    track_poll(state)
 
-    await interaction.response.send_message("Poll created.", ephemeral=True)
-    msg = await interaction.channel.send(embed=embed)
 
-    for i in range(len(opts)):
-        await msg.add_reaction(POLL_EMOJIS[i])
+@tree.command(name="endpoll", description="Close a poll now and post the final results.")
+@staff_only()
+@app_commands.describe(
+    poll_id="The poll number shown in the poll footer"
+)
+async def endpoll(interaction: discord.Interaction, poll_id: int):
+    await interaction.response.defer(ephemeral=True)
+    if not await close_poll(poll_id):
+        await interaction.followup.send("Poll not found or already closed.", ephemeral=True)
+        return
+    await interaction.followup.send(f"Poll #{poll_id} has been closed.", ephemeral=True)
 
 
 # ----------------- ANNOUNCE (TEXT ONLY) -----------------
 
-@tree.command(name="announce", description="Send an announcement to any channel.", guild=guild_obj)
+ANNOUNCE_BATCH = 100             # due deliveries picked up per wake-up
+ANNOUNCE_CONCURRENCY = 5         # channels sent to at once
+ANNOUNCE_MAX_ATTEMPTS = 5
+ANNOUNCE_RETRY_BASE = 30         # seconds; doubles per failed attempt
+ANNOUNCE_POLL_INTERVAL = 15      # clustered: other processes can queue rows without waking us
+
+ANNOUNCE_SENT, ANNOUNCE_FAILED = 1, 2
+
+announcement_wakeup = asyncio.Event()
+announcement_task: asyncio.Task | None = None
+
+
+def start_announcements():
+    global announcement_task
+    if announcement_task is None or announcement_task.done():
+        announcement_task = asyncio.create_task(_announcement_loop(), name="announcements")
+
+
+async def _announcement_loop():
+    await bot.wait_until_ready()
+    while True:
+        try:
+            next_at = await asyncio.to_thread(next_delivery_at)
+            timeout = None
+            if next_at is not None:
+                timeout = max(0, (datetime.fromisoformat(next_at) - datetime.utcnow()).total_seconds())
+            if SHARD_IDS:
+                timeout = min(timeout, ANNOUNCE_POLL_INTERVAL) if timeout is not None else ANNOUNCE_POLL_INTERVAL
+            # Sleep until the earliest deadline, or until /announce queues something sooner.
+            try:
+                await asyncio.wait_for(announcement_wakeup.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+            announcement_wakeup.clear()
+            await deliver_due_announcements()
+        except Exception:
+            log.exception("Announcement delivery failed")
+            await asyncio.sleep(ANNOUNCE_POLL_INTERVAL)
+
+
+async def _deliver_to_channel(channel_id: int, deliveries: list, semaphore: asyncio.Semaphore, results: list):
+    # Deliveries for one channel go out one after another, so a channel's
+    # rate limit bucket only ever sees a single sender; different channels
+    # proceed in parallel up to ANNOUNCE_CONCURRENCY.
+    channel = bot.get_partial_messageable(channel_id)
+    async with semaphore:
+        for ann_id, attempts, content in deliveries:
+            attempts += 1
+            try:
+                await channel.send(content)
+                results.append((ann_id, channel_id, ANNOUNCE_SENT, attempts, datetime.utcnow().isoformat(), None))
+                continue
+            except (discord.Forbidden, discord.NotFound) as e:
+                state, error, delay = ANNOUNCE_FAILED, f"{e.status} {e.text}", 0
+            except discord.HTTPException as e:
+                state, error = 0, f"{e.status} {e.text}"
+                delay = ANNOUNCE_RETRY_BASE * 2 ** (attempts - 1)
+                if e.status == 429:
+                    delay = max(delay, float(e.response.headers.get("Retry-After", 0)))
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                state, error = 0, repr(e)
+                delay = ANNOUNCE_RETRY_BASE * 2 ** (attempts - 1)
+            if state == 0 and attempts >= ANNOUNCE_MAX_ATTEMPTS:
+                state = ANNOUNCE_FAILED
+            log.warning("Announcement #%s to %s failed (attempt %s): %s", ann_id, channel_id, attempts, error)
+            next_at = (datetime.utcnow() + timedelta(seconds=delay)).isoformat()
+            results.append((ann_id, channel_id, state, attempts, next_at, error))
+
+
+async def deliver_due_announcements():
+    while rows := await asyncio.to_thread(load_due_deliveries, datetime.utcnow().isoformat(), ANNOUNCE_BATCH):
+        by_channel: dict[int, list] = {}
+        for ann_id, channel_id, attempts, content in rows:
+            by_channel.setdefault(channel_id, []).append((ann_id, attempts, content))
+
+        semaphore = asyncio.Semaphore(ANNOUNCE_CONCURRENCY)
+        results = []
+        try:
+            await asyncio.gather(*(
+                _deliver_to_channel(channel_id, deliveries, semaphore, results)
+                for channel_id, deliveries in by_channel.items()
+            ))
+        finally:
+            # Also on shutdown, so sends that went out are not repeated after a restart.
+            await asyncio.to_thread(record_deliveries, results)
+
+
+def parse_send_at(value: str) -> datetime | None:
+    """A delay like ``2h`` or a UTC time ``YYYY-MM-DD HH:MM``; naive UTC datetime."""
+    delta = parse_duration(value)
+    if delta:
+        return datetime.utcnow() + delta
+    try:
+        return datetime.strptime(value.strip(), "%Y-%m-%d %H:%M")
+    except ValueError:
+        return None
+
+
+@tree.command(name="announce", description="Send an announcement to one or more channels, now or later.")
 @staff_only()
 @app_commands.describe(
     channel="Channel to send the announcement in",
-    message="The announcement content"
+    message="The announcement content",
+    channels="More channels to send it to (mentions or IDs)",
+    send_at="Delay (e.g. 30m, 2h) or UTC time as YYYY-MM-DD HH:MM"
 )
 async def announce(
     interaction: discord.Interaction,
     channel: discord.TextChannel,
-    message: str
+    message: str,
+    channels: str | None = None,
+    send_at: str | None = None
 ):
-    await channel.send(message)
+    targets = [channel]
+    if channels:
+        for channel_id in dict.fromkeys(int(i) for i in re.findall(r"\d{15,20}", channels)):
+            extra = interaction.guild.get_channel(channel_id)
+            if not isinstance(extra, discord.TextChannel):
+                await interaction.response.send_message(f"<#{channel_id}> is not a text channel here.", ephemeral=True)
+                return
+            if extra not in targets:
+                targets.append(extra)
+
+    when = datetime.utcnow()
+    if send_at:
+        when = parse_send_at(send_at)
+        if when is None:
+            await interaction.response.send_message(
+                "Invalid time. Use a delay like `2h` or a UTC time like `2025-06-01 18:00`.",
+                ephemeral=True
+            )
+            return
+
+    announcement_id = await asyncio.to_thread(
+        create_announcement,
+        interaction.guild.id,
+        interaction.user.id,
+        message,
+        when.isoformat(),
+        [target.id for target in targets],
+    )
+    announcement_wakeup.set()
 
+    where = ", ".join(target.mention for target in targets)
+    when_text = f"for {discord.utils.format_dt(when.replace(tzinfo=discord.utils.utc))}" if send_at else "now"
     await interaction.response.send_message(
-        f"Announcement sent in {channel.mention}.",
+        f"Announcement #{announcement_id} queued {when_text} in {where}.",
         ephemeral=True
     )
 
 
 # ----------------- ROLEASSIGN -----------------
 
-@tree.command(name="roleassign", description="Assign or remove a role from a user.", guild=guild_obj)
+@tree.command(name="roleassign", description="Assign or remove a role from a user.")
 @staff_only()
 @app_commands.describe(
     user="User to modify",
@@ -908,15 +3128,7 @@ async def roleassign(interaction: discord.Interaction, user: discord.Member, rol
 
     log_channel = get_log_channel(interaction.guild)
     if log_channel:
-        embed = discord.Embed(
-            title="Role Updated",
-            color=discord.Color.blurple(),
-            timestamp=datetime.utcnow()
-        )
-        embed.add_field(name="User", value=user.mention, inline=False)
-        embed.add_field(name="Role", value=role.mention, inline=False)
-        embed.add_field(name="Action", value=action, inline=False)
-        embed.add_field(name="Moderator", value=interaction.user.mention, inline=False)
+        embed = ROLE_UPDATED.embed(user.mention, role.mention, action, interaction.user.mention)
         await log_channel.send(embed=embed)
 
     await interaction.response.send_message(
@@ -927,19 +3139,18 @@ async def roleassign(interaction: discord.Interaction, user: discord.Member, rol
 
 # ----------------- BETA ACCESS -----------------
 
-@tree.command(name="beta", description="Give a user access to the beta category.", guild=guild_obj)
+@tree.command(name="beta", description="Give a user access to the beta category.")
+@app_commands.guild_only()
+@require(Tier.OWNER)
 @app_commands.describe(
     user="User to give beta access to"
 )
 async def beta(interaction: discord.Interaction, user: discord.Member):
 
-    if interaction.user.id != OWNER_ID:
-        await interaction.response.send_message("You are not allowed to use this command.", ephemeral=True)
-        return
-
-    beta_role = interaction.guild.get_role(BETA_ROLE_ID)
+    beta_role_id = get_guild_config(interaction.guild.id).beta_role_id
+    beta_role = interaction.guild.get_role(beta_role_id) if beta_role_id else None
     if not beta_role:
-        await interaction.response.send_message("Beta role not found. Update BETA_ROLE_ID.", ephemeral=True)
+        await interaction.response.send_message("Beta role not found. Set it with /config.", ephemeral=True)
         return
 
     await user.add_roles(beta_role, reason=f"Beta access granted by {interaction.user}")
@@ -951,20 +3162,229 @@ async def beta(interaction: discord.Interaction, user: discord.Member):
 
     log_channel = get_log_channel(interaction.guild)
     if log_channel:
-        embed = discord.Embed(
-            title="Beta Access Granted",
-            color=discord.Color.blurple(),
-            timestamp=datetime.utcnow()
-        )
-        embed.add_field(name="User", value=user.mention, inline=False)
-        embed.add_field(name="Granted By", value=interaction.user.mention, inline=False)
-        embed.add_field(name="Role", value=beta_role.mention, inline=False)
+        embed = BETA_GRANTED.embed(user.mention, interaction.user.mention, beta_role.mention)
         await log_channel.send(embed=embed)
 
 
+# ----------------- BULK ROLE -----------------
+
+ROLE_JOB_RATE = 5            # role edits per second, shared by every queued job
+ROLE_JOB_BATCH = 25          # results per SQLite write and progress update
+INTERACTION_TTL = 14 * 60    # interaction tokens expire after 15 minutes
+
+ROLE_CHANGED, ROLE_SKIPPED, ROLE_FAILED = 1, 2, 3
+
+
+@dataclass
+class RoleJob:
+    id: int
+    guild_id: int
+    author_id: int
+    role_id: int
+    action: str                  # "add" or "remove"
+    target: str
+    pending: list[int]
+    counts: dict[int, int] = field(default_factory=dict)     # state -> members
+    interaction: discord.Interaction | None = None
+    started: float = field(default_factory=time.monotonic)
+
+    @property
+    def total(self) -> int:
+        return len(self.pending) + sum(self.counts.values())
+
+
+role_jobs: dict[int, RoleJob] = {}            # queued or running, by job ID
+role_job_queue: asyncio.Queue[RoleJob] = asyncio.Queue()
+role_job_worker: asyncio.Task | None = None
+
+REGISTRY.gauge(
+    "bluehorizon_role_job_pending",
+    "Member role edits waiting in the bulk role queue.",
+    lambda: sum(len(job.pending) for job in role_jobs.values()),
+)
+
+
+def queue_role_job(job: RoleJob):
+    global role_job_worker
+    role_jobs[job.id] = job
+    role_job_queue.put_nowait(job)
+    if role_job_worker is None or role_job_worker.done():
+        role_job_worker = asyncio.create_task(_role_job_loop(), name="role-jobs")
+
+
+async def restore_role_jobs():
+    for job_id, guild_id, author_id, role_id, action, target, pending, counts in await asyncio.to_thread(load_role_jobs):
+        if owns_guild(guild_id):
+            queue_role_job(RoleJob(job_id, guild_id, author_id, role_id, action, target, pending, counts))
+    if not role_job_queue.empty():
+        log.info("Resuming %s bulk role job(s)", role_job_queue.qsize())
+
+
+async def _role_job_loop():
+    await bot.wait_until_ready()
+    while True:
+        job = await role_job_queue.get()
+        try:
+            await run_role_job(job)
+        except Exception:
+            log.exception("Bulk role job #%s failed", job.id)
+        finally:
+            role_jobs.pop(job.id, None)
+
+
+def role_job_progress(job: RoleJob) -> str:
+    done = job.total - len(job.pending)
+    return (
+        f"Bulk role job #{job.id}: {done}/{job.total} processed "
+        f"({job.counts.get(ROLE_CHANGED, 0)} changed, {job.counts.get(ROLE_SKIPPED, 0)} skipped, "
+        f"{job.counts.get(ROLE_FAILED, 0)} failed)."
+    )
+
+
+async def report_role_job(job: RoleJob, final: bool = False):
+    if job.interaction is None or time.monotonic() - job.started > INTERACTION_TTL:
+        return
+    content = role_job_progress(job) + (" Done." if final else "")
+    try:
+        await job.interaction.edit_original_response(content=content)
+    except discord.HTTPException:
+        job.interaction = None
+
+
+async def run_role_job(job: RoleJob):
+    guild = bot.get_guild(job.guild_id)
+    reason = f"Bulk role job #{job.id}"
+    # Only one edit is ever in flight and they are spaced to ROLE_JOB_RATE, so
+    # a large job stays under the member-edit bucket instead of draining it and
+    # leaving discord.py to sleep through 429s that would stall other commands.
+    interval = 1 / ROLE_JOB_RATE
+    results = []
+    aborted = None
+
+    try:
+        while job.pending:
+            user_id = job.pending[-1]
+            member = guild.get_member(user_id) if guild else None
+            if member is not None and member._roles.has(job.role_id) == (job.action == "add"):
+                state = ROLE_SKIPPED
+            else:
+                started = time.monotonic()
+                try:
+                    if job.action == "add":
+                        await bot.http.add_role(job.guild_id, user_id, job.role_id, reason=reason)
+                    else:
+                        await bot.http.remove_role(job.guild_id, user_id, job.role_id, reason=reason)
+                    state = ROLE_CHANGED
+                except discord.NotFound:
+                    state = ROLE_FAILED          # member left or role deleted
+                except discord.Forbidden as e:
+                    aborted = e                  # hierarchy or permissions; every other member fails the same way
+                    break
+                except discord.HTTPException as e:
+                    log.warning("Bulk role job #%s: editing %s failed: %s", job.id, user_id, e)
+                    state = ROLE_FAILED
+                await asyncio.sleep(max(0, interval - (time.monotonic() - started)))
+
+            job.pending.pop()
+            job.counts[state] = job.counts.get(state, 0) + 1
+            results.append((user_id, state))
+            if len(results) >= ROLE_JOB_BATCH:
+                await asyncio.to_thread(record_role_job_progress, job.id, results)
+                results = []
+                await report_role_job(job)
+    except asyncio.CancelledError:
+        # Shutting down: keep what is done so the resumed job skips it.
+        await asyncio.to_thread(record_role_job_progress, job.id, results)
+        raise
+
+    if aborted is not None:
+        results.extend((user_id, ROLE_FAILED) for user_id in job.pending)
+        job.counts[ROLE_FAILED] = job.counts.get(ROLE_FAILED, 0) + len(job.pending)
+        job.pending.clear()
+        log.warning("Bulk role job #%s aborted: %s", job.id, aborted)
+    await asyncio.to_thread(record_role_job_progress, job.id, results, True)
+    await report_role_job(job, final=True)
+
+    if guild is not None:
+        role = guild.get_role(job.role_id)
+        embed = BULK_ROLE_UPDATED.embed(
+            role.mention if role else str(job.role_id),
+            "Added" if job.action == "add" else "Removed",
+            job.target,
+            f"<@{job.author_id}>",
+            str(job.counts.get(ROLE_CHANGED, 0)),
+            str(job.counts.get(ROLE_SKIPPED, 0)),
+            str(job.counts.get(ROLE_FAILED, 0)),
+            title=f"Bulk Role Update | Job #{job.id}",
+            description=f"Aborted: {aborted.text}" if aborted else None,
+        )
+        await send_log(guild, embed)
+
+
+@tree.command(name="bulkrole", description="Add or remove a role for many members at once.")
+@app_commands.guild_only()
+@require(Tier.ADMIN)
+@app_commands.describe(
+    role="Role to add or remove",
+    action="Whether to add or remove the role",
+    has_role="Only members who currently have this role",
+    joined_after="Only members who joined after this date (YYYY-MM-DD)",
+    user_ids="Explicit list of user IDs or mentions (ignores the other filters)"
+)
+async def bulkrole(
+    interaction: discord.Interaction,
+    role: discord.Role,
+    action: Literal["add", "remove"],
+    has_role: discord.Role | None = None,
+    joined_after: str | None = None,
+    user_ids: str | None = None
+):
+    guild = interaction.guild
+    if role.managed or role >= guild.me.top_role:
+        await interaction.response.send_message("I can't manage that role.", ephemeral=True)
+        return
+    if not (has_role or joined_after or user_ids):
+        await interaction.response.send_message(
+            "Choose a target: `has_role`, `joined_after` or `user_ids`.",
+            ephemeral=True
+        )
+        return
+
+    if user_ids:
+        targets = list(dict.fromkeys(int(i) for i in re.findall(r"\d{15,20}", user_ids)))
+        target = f"{len(targets)} listed user(s)"
+    else:
+        members = has_role.members if has_role else guild.members
+        filters = [f"members with {has_role.mention}"] if has_role else ["all members"]
+        if joined_after:
+            try:
+                since = datetime.strptime(joined_after, "%Y-%m-%d").replace(tzinfo=discord.utils.utc)
+            except ValueError:
+                await interaction.response.send_message("Invalid date. Use `YYYY-MM-DD`.", ephemeral=True)
+                return
+            members = [m for m in members if m.joined_at and m.joined_at > since]
+            filters.append(f"joined after {joined_after}")
+        targets = [m.id for m in members if not m.bot]
+        target = " ".join(filters)
+
+    if not targets:
+        await interaction.response.send_message("No members match that target.", ephemeral=True)
+        return
+
+    await interaction.response.defer(ephemeral=True, thinking=True)
+    job_id = await asyncio.to_thread(
+        create_role_job, guild.id, interaction.user.id, role.id, action, target, targets
+    )
+    job = RoleJob(job_id, guild.id, interaction.user.id, role.id, action, target, targets, interaction=interaction)
+    await interaction.edit_original_response(
+        content=f"Bulk role job #{job_id} queued for {len(targets)} member(s)."
+    )
+    queue_role_job(job)
+
+
 # ----------------- ADVANCED PURGE -----------------
 
-@tree.command(name="purge", description="Advanced message purge system.", guild=guild_obj)
+@tree.command(name="purge", description="Advanced message purge system.")
 @staff_only()
 @app_commands.describe(
     amount="How many messages to delete (1–5000)",
@@ -1026,26 +3446,24 @@ async def purge(
 
     log_channel = get_log_channel(interaction.guild)
     if log_channel:
-        embed = discord.Embed(
-            title="Messages Purged",
-            color=discord.Color.dark_red(),
-            timestamp=datetime.utcnow()
-        )
-        embed.add_field(name="Moderator", value=interaction.user.mention, inline=False)
-        embed.add_field(name="Channel", value=interaction.channel.mention, inline=False)
-        embed.add_field(name="Amount", value=str(deleted_total), inline=False)
-
+        filters = []
         if user:
-            embed.add_field(name="Filtered User", value=user.mention, inline=False)
+            filters.append(("Filtered User", user.mention))
         if contains:
-            embed.add_field(name="Contains", value=contains, inline=False)
+            filters.append(("Contains", contains))
         if bots:
-            embed.add_field(name="Bots Only", value="True", inline=False)
+            filters.append(("Bots Only", "True"))
         if images:
-            embed.add_field(name="Images Only", value="True", inline=False)
+            filters.append(("Images Only", "True"))
         if after_message:
-            embed.add_field(name="After Message", value=f"[Jump]({after})", inline=False)
+            filters.append(("After Message", f"[Jump]({after})"))
 
+        embed = MESSAGES_PURGED.embed(
+            interaction.user.mention,
+            interaction.channel.mention,
+            str(deleted_total),
+            extra_fields=filters,
+        )
         await log_channel.send(embed=embed)
 
     await interaction.followup.send(
@@ -1053,20 +3471,138 @@ async def purge(
         ephemeral=True
     )
 
-@tree.command(name="promote", description="Promote a Roblox user to the next rank.", guild=guild_obj)
+# ----------------- ACCOUNT LINKS -----------------
+
+LINK_REFRESH_INTERVAL = 5 * 60   # seconds between background rank refreshes
+LINK_REFRESH_BATCH = 50          # stale links refreshed per run
+LINK_REFRESH_CONCURRENCY = 5     # Roblox lookups in flight during a refresh
+
+link_refresh_task: asyncio.Task | None = None
+
+
+async def refresh_stale_links() -> int:
+    links = await asyncio.to_thread(get_stale_links, time.time() - RANK_TTL, LINK_REFRESH_BATCH)
+    semaphore = asyncio.Semaphore(LINK_REFRESH_CONCURRENCY)
+
+    async def lookup(link: AccountLink):
+        async with semaphore:
+            ok, role = await fetch_user_group_role(link.roblox_id)
+        # A failed lookup (429, outage) keeps the cached rank and checked_at,
+        # so the link stays stale and is retried on the next pass.
+        return rank_update(link.discord_id, role) if ok else None
+
+    updates = [update for update in await asyncio.gather(*(lookup(link) for link in links)) if update]
+    if updates:
+        await asyncio.to_thread(update_link_ranks, updates)
+    return len(updates)
+
+
+async def _link_refresh_loop():
+    while True:
+        await asyncio.sleep(LINK_REFRESH_INTERVAL)
+        try:
+            refreshed = await refresh_stale_links()
+            if refreshed:
+                log.debug("Refreshed %s linked Roblox rank(s)", refreshed)
+        except Exception:
+            log.exception("Refreshing linked Roblox ranks failed")
+
+
+def start_link_refresh():
+    global link_refresh_task
+    if link_refresh_task is None or link_refresh_task.done():
+        link_refresh_task = asyncio.create_task(_link_refresh_loop(), name="link-refresh")
+
+
+@tree.command(name="link", description="Link a member to their Roblox account.")
 @staff_only()
-async def promote_command(interaction: discord.Interaction, username: str):
+@app_commands.describe(
+    member="Discord member to link",
+    username="Their Roblox username"
+)
+async def link_command(interaction: discord.Interaction, member: discord.Member, username: str):
     await interaction.response.defer(ephemeral=True)
 
+    roblox_id = await get_roblox_user_id(username)
+    if not roblox_id:
+        return await interaction.followup.send("Could not find that Roblox user.", ephemeral=True)
+
+    ok, role = await fetch_user_group_role(roblox_id)
+    await asyncio.to_thread(save_account_link, member.id, roblox_id, username, role, interaction.user.id)
+
+    if role:
+        rank_text = f"rank `{role.get('rank')}` ({role.get('name')})"
+    else:
+        rank_text = "not in the group" if ok else "rank not checked yet (Roblox lookup failed)"
+    await interaction.followup.send(
+        f"Linked {member.mention} to Roblox **{username}** (`{roblox_id}`), {rank_text}.",
+        ephemeral=True
+    )
+
+
+@tree.command(name="unlink", description="Remove a member's Roblox account link.")
+@staff_only()
+@app_commands.describe(
+    member="Discord member to unlink"
+)
+async def unlink_command(interaction: discord.Interaction, member: discord.Member):
+    if not await asyncio.to_thread(delete_account_link, member.id):
+        await interaction.response.send_message(f"{member.mention} has no linked account.", ephemeral=True)
+        return
+    await interaction.response.send_message(f"Unlinked {member.mention}.", ephemeral=True)
+
+
+async def resolve_rank_target(
+    interaction: discord.Interaction,
+    member: discord.Member | None,
+    username: str | None,
+) -> tuple[int, str, AccountLink | None] | None:
+    """(roblox_id, display name, link) for /promote and /demote; replies and returns None on failure."""
+    if member is not None:
+        link = await asyncio.to_thread(get_account_link, member.id)
+        if link is None:
+            await interaction.followup.send(
+                f"{member.mention} has no linked Roblox account. Use /link first.",
+                ephemeral=True
+            )
+            return None
+        return link.roblox_id, link.roblox_username, link
+
+    if not username:
+        await interaction.followup.send("Give a member or a Roblox username.", ephemeral=True)
+        return None
     user_id = await get_roblox_user_id(username)
     if not user_id:
-        return await interaction.followup.send("Could not find that Roblox user.", ephemeral=True)
+        await interaction.followup.send("Could not find that Roblox user.", ephemeral=True)
+        return None
+    return user_id, username, None
 
-    roles = await get_group_roles()
+
+# ----------------- ROBLOX RANKS -----------------
+
+@tree.command(name="promote", description="Promote a Roblox user to the next rank.")
+@staff_only()
+@app_commands.describe(
+    member="Linked Discord member to promote",
+    username="Roblox username (for members without a link)"
+)
+async def promote_command(
+    interaction: discord.Interaction,
+    member: discord.Member | None = None,
+    username: str | None = None
+):
+    await interaction.response.defer(ephemeral=True)
+
+    target = await resolve_rank_target(interaction, member, username)
+    if target is None:
+        return
+    user_id, username, link = target
+
+    roles = await get_group_roles_cached()
     if not roles:
         return await interaction.followup.send("Could not fetch group roles.", ephemeral=True)
 
-    current_role = await get_user_group_role(user_id)
+    current_role = await get_linked_group_role(link) if link else await get_user_group_role(user_id)
     if not current_role:
         return await interaction.followup.send("User is not in the group.", ephemeral=True)
 
@@ -1082,26 +3618,37 @@ async def promote_command(interaction: discord.Interaction, username: str):
 
     if not success:
         return await interaction.followup.send("Failed to promote via Roblox API.", ephemeral=True)
+    if link:
+        await asyncio.to_thread(update_link_ranks, [rank_update(link.discord_id, next_role)])
 
     await interaction.followup.send(
         f"Promoted **{username}** to rank `{next_role.get('rank')}`.",
         ephemeral=True
     )
 
-@tree.command(name="demote", description="Demote a Roblox user to the previous rank.", guild=guild_obj)
+@tree.command(name="demote", description="Demote a Roblox user to the previous rank.")
 @staff_only()
-async def demote_command(interaction: discord.Interaction, username: str):
+@app_commands.describe(
+    member="Linked Discord member to demote",
+    username="Roblox username (for members without a link)"
+)
+async def demote_command(
+    interaction: discord.Interaction,
+    member: discord.Member | None = None,
+    username: str | None = None
+):
     await interaction.response.defer(ephemeral=True)
 
-    user_id = await get_roblox_user_id(username)
-    if not user_id:
-        return await interaction.followup.send("Could not find that Roblox user.", ephemeral=True)
+    target = await resolve_rank_target(interaction, member, username)
+    if target is None:
+        return
+    user_id, username, link = target
 
-    roles = await get_group_roles()
+    roles = await get_group_roles_cached()
     if not roles:
         return await interaction.followup.send("Could not fetch group roles.", ephemeral=True)
 
-    current_role = await get_user_group_role(user_id)
+    current_role = await get_linked_group_role(link) if link else await get_user_group_role(user_id)
     if not current_role:
         return await interaction.followup.send("User is not in the group.", ephemeral=True)
 
@@ -1117,14 +3664,462 @@ async def demote_command(interaction: discord.Interaction, username: str):
 
     if not success:
         return await interaction.followup.send("Failed to demote via Roblox API.", ephemeral=True)
+    if link:
+        await asyncio.to_thread(update_link_ranks, [rank_update(link.discord_id, next_role)])
 
     await interaction.followup.send(
         f"Demoted **{username}** to rank `{next_role.get('rank')}`.",
         ephemeral=True
     )
+
+# ----------------- GUILD CONFIG -----------------
+
+@tree.command(name="config", description="View or change this server's bot settings.")
+@app_commands.guild_only()
+@app_commands.default_permissions(manage_guild=True)
+@require(Tier.ADMIN)
+@app_commands.describe(
+    staff_role="Role allowed to use moderation commands",
+    helper_role="Role allowed to use helper commands such as /history",
+    admin_role="Role allowed to change these settings",
+    log_channel="Channel that receives log messages",
+    beta_role="Role granted by /beta",
+    ownership="Mentions or IDs of users protected by the ownership ping notice"
+)
+async def config(
+    interaction: discord.Interaction,
+    staff_role: discord.Role | None = None,
+    helper_role: discord.Role | None = None,
+    admin_role: discord.Role | None = None,
+    log_channel: discord.TextChannel | None = None,
+    beta_role: discord.Role | None = None,
+    ownership: str | None = None
+):
+    changes = {}
+    if staff_role:
+        changes["staff_role_id"] = staff_role.id
+    if helper_role:
+        changes["helper_role_id"] = helper_role.id
+    if admin_role:
+        changes["admin_role_id"] = admin_role.id
+    if log_channel:
+        changes["log_channel_name"] = log_channel.name
+    if beta_role:
+        changes["beta_role_id"] = beta_role.id
+    if ownership is not None:
+        changes["ownership_ids"] = frozenset(int(i) for i in re.findall(r"\d{15,20}", ownership))
+
+    if changes:
+        current = await asyncio.to_thread(set_guild_config, interaction.guild.id, **changes)
+    else:
+        current = get_guild_config(interaction.guild.id)
+
+    def role_text(role_id):
+        return f"<@&{role_id}>" if role_id else "Not set"
+
+    embed = discord.Embed(
+        title="Server Configuration" if not changes else "Server Configuration Updated",
+        color=discord.Color.blurple(),
+        timestamp=datetime.utcnow()
+    )
+    embed.add_field(name="Admin Role", value=role_text(current.admin_role_id), inline=False)
+    embed.add_field(name="Staff Role", value=role_text(current.staff_role_id), inline=False)
+    embed.add_field(name="Helper Role", value=role_text(current.helper_role_id), inline=False)
+    embed.add_field(name="Log Channel", value=f"#{current.log_channel_name}", inline=False)
+    embed.add_field(name="Beta Role", value=role_text(current.beta_role_id), inline=False)
+    embed.add_field(
+        name="Ownership",
+        value=", ".join(f"<@{i}>" for i in sorted(current.ownership_ids)) or "None",
+        inline=False
+    )
+    await interaction.response.send_message(embed=embed, ephemeral=True)
+
+
+# ----------------- EXPORT CASES -----------------
+
+@tree.command(name="exportcases", description="Export this server's cases and warnings.")
+@app_commands.guild_only()
+@require(Tier.ADMIN)
+@app_commands.describe(
+    format="File format of the export"
+)
+async def exportcases(interaction: discord.Interaction, format: Literal["csv", "jsonl"] = "csv"):
+    await interaction.response.defer(ephemeral=True, thinking=True)
+
+    files = []
+    counts = []
+    for table in EXPORT_COLUMNS:
+        # Spooled to disk past 1 MiB so a large export never sits in memory.
+        fileobj = tempfile.SpooledTemporaryFile(max_size=1 << 20)
+        count = await asyncio.to_thread(export_table, table, fileobj, format, interaction.guild.id)
+        fileobj.seek(0, os.SEEK_END)
+        size = fileobj.tell()
+        fileobj.seek(0)
+        if size > interaction.guild.filesize_limit:
+            fileobj.close()
+            for f in files:
+                f.close()
+            await interaction.followup.send(
+                f"The {table} export is too large to attach ({size // 1024} KiB). "
+                "Use `python bot.py export` on the server instead.",
+                ephemeral=True
+            )
+            return
+        files.append(discord.File(fileobj, filename=f"{table}-{interaction.guild.id}.{format}.gz"))
+        counts.append(f"{count} {table}")
+
+    await interaction.followup.send(f"Exported {', '.join(counts)}.", files=files, ephemeral=True)
+
+
+# ----------------- STATS -----------------
+
+def _summary_lines(histogram, label_format: str) -> list[str]:
+    lines = []
+    for labels, count, mean, p95 in histogram.summary():
+        p95_text = "inf" if p95 == float("inf") else f"{p95 * 1000:.0f}"
+        lines.append(f"{label_format.format(**labels)}: {count}x, mean {mean * 1000:.1f} ms, p95 <= {p95_text} ms")
+    return lines
+
+
+@tree.command(name="stats", description="Show bot latency and queue metrics.")
+@staff_only()
+async def stats(interaction: discord.Interaction):
+    sections = [
+        ("Commands", _summary_lines(COMMAND_LATENCY, "/{command} ({status})")),
+        ("Roblox", _summary_lines(ROBLOX_LATENCY, "{endpoint} [{status}]")),
+        ("Database", _summary_lines(DB_DURATION, "{query}")),
+        ("Events", _summary_lines(EVENT_DURATION, "{event}")),
+    ]
+    text = [f"Background tasks in flight: {len(background_tasks)}"]
+    for title, lines in sections:
+        if lines:
+            text.append(f"\n**{title}**\n" + "\n".join(lines))
+
+    report = "\n".join(text)
+    if len(report) > 1900:
+        report = report[:1900] + "\n…"
+
+    await interaction.response.send_message(
+        report,
+        file=discord.File(io.BytesIO(REGISTRY.render().encode()), filename="metrics.txt"),
+        ephemeral=True
+    )
+
+# ----------------- MOD STATS -----------------
+
+SPARK_BLOCKS = "▁▂▃▄▅▆▇█"
+
+
+def sparkline(values: list[int]) -> str:
+    top = max(values) or 1
+    return "".join(SPARK_BLOCKS[round(v / top * (len(SPARK_BLOCKS) - 1))] for v in values)
+
+
+@tree.command(name="modstats", description="Moderation activity per moderator and action.")
+@staff_only()
+@app_commands.describe(
+    days="How many days back to include",
+    moderator="Only show this moderator"
+)
+async def modstats(
+    interaction: discord.Interaction,
+    days: app_commands.Range[int, 1, 365] = 30,
+    moderator: discord.Member | None = None
+):
+    today = datetime.utcnow().date()
+    since = today - timedelta(days=days - 1)
+    # Reads daily rollups only: at most days x moderators x actions rows,
+    # however many cases the guild has.
+    rows = await asyncio.to_thread(
+        get_daily_stats, interaction.guild.id, since.isoformat(), moderator.id if moderator else None
+    )
+    if not rows:
+        await interaction.response.send_message(f"No cases in the last {days} day(s).", ephemeral=True)
+        return
+
+    by_moderator: dict[int, int] = {}
+    by_action: dict[str, int] = {}
+    weeks = [0] * -(-days // 7)       # oldest first; the last bucket ends today
+    for day, mod_id, action, count in rows:
+        by_moderator[mod_id] = by_moderator.get(mod_id, 0) + count
+        by_action[action] = by_action.get(action, 0) + count
+        age = (today - datetime.fromisoformat(day).date()).days
+        weeks[len(weeks) - 1 - age // 7] += count
+    total = sum(by_action.values())
+
+    embed = discord.Embed(
+        title=f"Moderation Stats — {moderator or interaction.guild.name}",
+        description=f"{total} case(s) in the last {days} day(s).",
+        color=discord.Color.blurple(),
+        timestamp=discord.utils.utcnow()
+    )
+    if moderator is None:
+        leaders = sorted(by_moderator.items(), key=lambda item: item[1], reverse=True)[:10]
+        embed.add_field(
+            name="Top Moderators",
+            value="\n".join(f"**{i}.** <@{mod_id}> — {count}" for i, (mod_id, count) in enumerate(leaders, 1)),
+            inline=False
+        )
+    embed.add_field(
+        name="By Action",
+        value="\n".join(
+            f"{action}: {count}" for action, count in sorted(by_action.items(), key=lambda item: item[1], reverse=True)
+        ),
+        inline=False
+    )
+    if len(weeks) > 1:
+        embed.add_field(
+            name="Weekly Trend",
+            value=f"`{sparkline(weeks)}` {' / '.join(map(str, weeks))}",
+            inline=False
+        )
+
+    await interaction.response.send_message(embed=embed, ephemeral=True)
+
+
+# ----------------- ARCHIVAL -----------------
+
+archive_task: asyncio.Task | None = None
+
+
+async def archive_once():
+    cutoff = (datetime.utcnow() - timedelta(days=ARCHIVE_AFTER_DAYS)).isoformat()
+    cases, warnings = await asyncio.to_thread(archive_cold_cases, cutoff)
+    if cases or warnings:
+        log.info("Archived %s case(s) and %s warning(s) older than %s", cases, warnings, cutoff)
+
+
+async def _archive_loop():
+    while True:
+        try:
+            await archive_once()
+        except Exception:
+            log.exception("Cold-case archival failed")
+        await asyncio.sleep(ARCHIVE_INTERVAL)
+
+
+def start_archival():
+    global archive_task
+    if archive_task is None or archive_task.done():
+        archive_task = asyncio.create_task(_archive_loop(), name="archive")
+
+
+# ----------------- COMMAND SYNC -----------------
+
+def command_tree_hash() -> str:
+    commands_payload = sorted(
+        (command.to_dict(tree) for command in tree.get_commands()),
+        key=lambda payload: payload["name"],
+    )
+    return hashlib.sha256(json.dumps(commands_payload, sort_keys=True).encode()).hexdigest()
+
+
+async def sync_commands_if_changed():
+    """Upload the command tree only when its definition differs from the last synced one."""
+    key = "command_hash:global"
+    current = command_tree_hash()
+    stored = await asyncio.to_thread(get_meta, key)
+
+    if stored == current and not FORCE_SYNC:
+        log.info("Slash commands unchanged (%s), skipping sync.", current[:12])
+        return
+
+    # Commands used to be registered on the home guild only. Clear that copy
+    # on the first global sync so the home guild does not show every command
+    # twice; older databases have no record of that guild sync at all.
+    if stored is None:
+        await tree.sync(guild=guild_obj)
+        await asyncio.to_thread(delete_meta, f"command_hash:{GUILD_ID}")
+
+    await tree.sync()
+    await asyncio.to_thread(set_meta, key, current)
+    log.info("Slash commands synced (%s).", current[:12])
+
+
+# ----------------- SHUTDOWN -----------------
+
+SHUTDOWN_DEADLINE = 10      # seconds to finish pending work before disconnecting
+
+
+async def drain_pending_work(deadline: float = SHUTDOWN_DEADLINE):
+    started = time.monotonic()
+
+    # Stop the periodic loops first so they don't start new work. The ones
+    # holding unsaved progress (role jobs, announcements) persist it when
+    # cancelled, so wait for them along with everything else.
+    loops = [
+        task for task in (archive_task, link_refresh_task, announcement_task, poll_flush_task, role_job_worker)
+        if task is not None and not task.done()
+    ]
+    for task in loops:
+        task.cancel()
+    for state in open_polls.values():
+        if state.close_task is not None:
+            state.close_task.cancel()
+
+    # Work that is only waiting on a timer goes out now.
+    if forward_task is not None and not forward_task.done():
+        forward_task.cancel()
+        spawn(flush_forwards(), name="forward-deleted-logs")
+    if tamper_task is not None and not tamper_task.done():
+        tamper_task.cancel()
+        spawn(flush_tamper_alerts(), name="log-tamper-alert")
+    try:
+        await flush_polls()
+    except Exception:
+        log.exception("Flushing poll votes on shutdown failed")
+
+    pending = set(background_tasks) | set(loops)
+    if pending:
+        _, pending = await asyncio.wait(pending, timeout=max(0, deadline - (time.monotonic() - started)))
+    if pending:
+        log.warning("Shutdown deadline reached; abandoning %s task(s)", len(pending))
+        for task in pending:
+            task.cancel()
+
+    try:
+        await asyncio.to_thread(set_meta, f"recent_events:{CLUSTER_ID}", recent_events.dump())
+    except Exception:
+        log.exception("Saving recent event keys failed")
+    log.info("Drained pending work in %.1fs", time.monotonic() - started)
+
+
 # ----------------- RUN -----------------
 
-bot.run(TOKEN)
+def run_writer(address: str):
+    global writer_client
+    writer_client = None  # this process *is* the writer
+    init_db()
+    asyncio.run(serve_writer(address, WRITE_OPS))
+
+
+def run_cluster(clusters: int, shards: int, writer_address: str):
+    """Run one writer process plus ``clusters`` bot processes splitting ``shards`` between them."""
+    script = os.path.abspath(__file__)
+    base_env = {k: v for k, v in os.environ.items() if k not in ("DB_WRITER", "SHARD_IDS", "CLUSTER_ID")}
+
+    writer = subprocess.Popen([sys.executable, script, "writer", "--address", writer_address], env=base_env)
+    if not wait_until_ready(writer_address):
+        writer.terminate()
+        raise SystemExit(f"DB writer did not start on {writer_address}.")
+
+    per_cluster = -(-shards // clusters)
+    processes = [writer]
+    try:
+        for cluster_id in range(clusters):
+            shard_ids = range(cluster_id * per_cluster, min((cluster_id + 1) * per_cluster, shards))
+            if not shard_ids:
+                break
+            env = dict(
+                base_env,
+                SHARD_COUNT=str(shards),
+                SHARD_IDS=",".join(map(str, shard_ids)),
+                CLUSTER_ID=str(cluster_id),
+                DB_WRITER=writer_address,
+            )
+            if METRICS_PORT:
+                env["METRICS_PORT"] = str(METRICS_PORT + cluster_id)
+            log.info("Starting cluster %s with shards %s", cluster_id, list(shard_ids))
+            processes.append(subprocess.Popen([sys.executable, script, "run"], env=env))
+
+        for process in processes[1:]:
+            process.wait()
+    finally:
+        for process in processes:
+            if process.poll() is None:
+                process.terminate()
+        for process in processes:
+            process.wait()
+
+
+def run_export(output_dir: str, fmt: str, guild_id: int | None, compress: bool):
+    os.makedirs(output_dir, exist_ok=True)
+    for table in EXPORT_COLUMNS:
+        path = os.path.join(output_dir, f"{table}.{fmt}" + (".gz" if compress else ""))
+        with open(path, "wb") as f:
+            count = export_table(table, f, fmt, guild_id, compress)
+        log.info("Exported %s %s to %s", count, table, path)
+
+
+def run_import(paths: list[str], table: str | None):
+    init_db()
+    for path in paths:
+        name = table or os.path.basename(path).split(".")[0]
+        if name not in EXPORT_COLUMNS:
+            raise SystemExit(f"Cannot tell which table {path} belongs to; pass --table.")
+        log.info("Imported %s new row(s) into %s from %s", import_table(name, path), name, path)
+
+
+def main(argv: list[str] | None = None):
+    parser = argparse.ArgumentParser(description="Blue Horizon moderation bot.")
+    subcommands = parser.add_subparsers(dest="command")
+    subcommands.add_parser("run", help="Run the bot (default).")
+
+    writer_parser = subcommands.add_parser("writer", help="Run the shared SQLite writer process.")
+    writer_parser.add_argument("--address", default=DB_WRITER or "127.0.0.1:8765")
+
+    cluster_parser = subcommands.add_parser("cluster", help="Run shard clusters as separate processes.")
+    cluster_parser.add_argument("--clusters", type=int, required=True, help="number of bot processes")
+    cluster_parser.add_argument("--shards", type=int, required=True, help="total shard count")
+    cluster_parser.add_argument("--writer-address", default=DB_WRITER or "127.0.0.1:8765")
+
+    export_parser = subcommands.add_parser("export", help="Export cases and warnings to files.")
+    export_parser.add_argument("output_dir")
+    export_parser.add_argument("--format", choices=["csv", "jsonl"], default="csv")
+    export_parser.add_argument("--guild", type=int, help="only rows for this guild ID")
+    export_parser.add_argument("--no-gzip", dest="compress", action="store_false")
+
+    import_parser = subcommands.add_parser("import", help="Load exported cases/warnings files.")
+    import_parser.add_argument("paths", nargs="+", metavar="file")
+    import_parser.add_argument("--table", choices=list(EXPORT_COLUMNS), help="default: from the file name")
+
+    archive_parser = subcommands.add_parser("archive", help="Move old cases to the archive database now.")
+    archive_parser.add_argument("--days", type=int, default=ARCHIVE_AFTER_DAYS, help="archive cases older than this")
+
+    backup_parser = subcommands.add_parser("backup", help="Copy the live database with the SQLite backup API.")
+    backup_parser.add_argument("dest")
+
+    args = parser.parse_args(argv)
+
+    log_format = "%(asctime)s %(levelname)s %(name)s: %(message)s"
+    if SHARD_IDS:
+        log_format = f"%(asctime)s %(levelname)s [cluster {CLUSTER_ID}] %(name)s: %(message)s"
+    logging.basicConfig(level=LOG_LEVEL, format=log_format)
+
+    if args.command == "writer":
+        run_writer(args.address)
+        return
+    if args.command == "cluster":
+        run_cluster(args.clusters, args.shards, args.writer_address)
+        return
+    if args.command == "export":
+        run_export(args.output_dir, args.format, args.guild, args.compress)
+        return
+    if args.command == "import":
+        run_import(args.paths, args.table)
+        return
+    if args.command == "archive":
+        init_db()
+        cutoff = (datetime.utcnow() - timedelta(days=args.days)).isoformat()
+        cases, warnings = archive_cold_cases(cutoff)
+        log.info("Archived %s case(s) and %s warning(s) to %s", cases, warnings, ARCHIVE_DB_PATH)
+        return
+    if args.command == "backup":
+        for path in backup_db(args.dest):
+            log.info("Backed up to %s", path)
+        return
+
+    if not TOKEN:
+        raise SystemExit("TOKEN is not set.")
+    if SHARD_IDS and not (SHARD_COUNT or "").isdigit():
+        # Which guilds a shard owns depends on the total shard count.
+        raise SystemExit("SHARD_IDS needs a numeric SHARD_COUNT.")
+    bot.run(TOKEN, log_handler=None)
+
+
+if __name__ == "__main__":
+    main()
+
 
 
 
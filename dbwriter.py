@@ -0,0 +1,147 @@
+"""Single SQLite writer process for multi-process (clustered) deployments.
+
+Every cluster process reads the database directly (WAL mode allows that),
+but all writes are sent here over a local socket and executed one at a
+time on a single connection-owning thread. That keeps AUTOINCREMENT case
+IDs globally unique and avoids "database is locked" errors between
+processes.
+
+Protocol: one JSON object per line in each direction.
+    -> {"op": "record_case", "args": [...]}
+    <- {"ok": true, "result": ...} | {"ok": false, "error": "..."}
+
+Addresses are either ``host:port`` or a filesystem path for a Unix socket.
+"""
+
+import asyncio
+import json
+import logging
+import socket
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable
+
+log = logging.getLogger("bluehorizon.dbwriter")
+
+
+class WriterError(Exception):
+    pass
+
+
+def _parse_address(address: str):
+    if address.startswith("/") or address.startswith("."):
+        return socket.AF_UNIX, address
+    host, _, port = address.rpartition(":")
+    return socket.AF_INET, (host or "127.0.0.1", int(port))
+
+
+async def serve(address: str, ops: dict[str, Callable]):
+    # One worker thread: requests from every cluster are applied strictly in order.
+    executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="db-writer")
+    loop = asyncio.get_running_loop()
+
+    async def handle(reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            while line := await reader.readline():
+                if not line.endswith(b"\n"):
+                    break  # client went away mid-request
+                request = json.loads(line)
+                fn = ops.get(request.get("op"))
+                if fn is None:
+                    response = {"ok": False, "error": f"unknown op {request.get('op')!r}"}
+                else:
+                    try:
+                        result = await loop.run_in_executor(executor, lambda: fn(*request.get("args", [])))
+                        response = {"ok": True, "result": result}
+                    except Exception as e:
+                        log.exception("Write op %s failed", request["op"])
+                        response = {"ok": False, "error": f"{type(e).__name__}: {e}"}
+                writer.write(json.dumps(response).encode() + b"\n")
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    family, target = _parse_address(address)
+    if family == socket.AF_UNIX:
+        server = await asyncio.start_unix_server(handle, path=target)
+    else:
+        server = await asyncio.start_server(handle, host=target[0], port=target[1])
+
+    log.info("DB writer listening on %s", address)
+    async with server:
+        await server.serve_forever()
+
+
+class WriterClient:
+    """Blocking client; safe to use from any thread (one socket per thread)."""
+
+    def __init__(self, address: str, timeout: float = 30):
+        self.address = address
+        self.timeout = timeout
+        self._local = threading.local()
+
+    def _connection(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            family, target = _parse_address(self.address)
+            sock = socket.socket(family, socket.SOCK_STREAM)
+            sock.settimeout(self.timeout)
+            sock.connect(target)
+            conn = self._local.conn = (sock, sock.makefile("rb"))
+        return conn
+
+    def _drop(self):
+        conn = getattr(self._local, "conn", None)
+        self._local.conn = None
+        if conn is not None:
+            conn[0].close()
+
+    def call(self, op: str, *args):
+        payload = json.dumps({"op": op, "args": args}).encode() + b"\n"
+        try:
+            sock, stream = self._connection()
+            try:
+                sock.sendall(payload)
+            except OSError:
+                # Stale connection (writer restarted). The request never reached
+                # it, so one retry on a fresh socket cannot double-apply a write.
+                self._drop()
+                sock, stream = self._connection()
+                sock.sendall(payload)
+        except OSError as e:
+            self._drop()
+            raise WriterError(f"could not send {op} to the writer: {e}") from e
+
+        # Any failure from here on leaves the socket mid-response, so it is
+        # dropped; the next call on this thread reconnects.
+        try:
+            line = stream.readline()
+        except TimeoutError as e:
+            self._drop()
+            raise WriterError(f"{op} timed out after {self.timeout}s; outcome unknown") from e
+        except OSError as e:
+            self._drop()
+            raise WriterError(f"{op} lost the writer connection; outcome unknown: {e}") from e
+        if not line:
+            self._drop()
+            raise WriterError("writer closed the connection")
+        response = json.loads(line)
+        if not response["ok"]:
+            raise WriterError(response["error"])
+        return response["result"]
+
+
+def wait_until_ready(address: str, timeout: float = 10) -> bool:
+    deadline = time.monotonic() + timeout
+    family, target = _parse_address(address)
+    while time.monotonic() < deadline:
+        try:
+            with socket.socket(family, socket.SOCK_STREAM) as sock:
+                sock.connect(target)
+            return True
+        except OSError:
+            time.sleep(0.1)
+    return False
@@ -0,0 +1,92 @@
+"""Prebuilt embed templates for log and DM traffic.
+
+The static parts of an embed (title, colour, footer, field names) are
+serialised once per event type. Each call only fills in the dynamic
+values and hands discord.py the finished payload dict, skipping the
+Embed attribute round-trip that ``add_field`` + ``to_dict`` costs.
+"""
+
+import discord
+
+
+class PayloadEmbed(discord.Embed):
+    """Send-only embed wrapping an already serialised payload.
+
+    Only ``title`` and ``description`` are mirrored onto the object;
+    everything else lives in the payload returned by ``to_dict``.
+    """
+
+    __slots__ = ("_payload",)
+
+    def __init__(self, payload: dict):
+        super().__init__(title=payload.get("title"), description=payload.get("description"))
+        self._payload = payload
+
+    def to_dict(self) -> dict:
+        return self._payload
+
+    def __len__(self) -> int:
+        # Counted the way Discord's 6000 character embed limit does.
+        payload = self._payload
+        total = len(payload.get("title", "")) + len(payload.get("description", ""))
+        total += len(payload.get("footer", {}).get("text", ""))
+        total += len(payload.get("author", {}).get("name", ""))
+        for field in payload.get("fields", ()):
+            total += len(field["name"]) + len(field["value"])
+        return total
+
+
+class EmbedTemplate:
+    __slots__ = ("_static", "_field_names")
+
+    def __init__(
+        self,
+        title: str | None = None,
+        *,
+        color: discord.Color,
+        fields: tuple[str, ...] = (),
+        footer: str | None = None,
+    ):
+        static = {"type": "rich", "color": color.value}
+        if title is not None:
+            static["title"] = title
+        if footer is not None:
+            static["footer"] = {"text": footer}
+        self._static = static
+        self._field_names = fields
+
+    def render(
+        self,
+        *values: str,
+        title: str | None = None,
+        description: str | None = None,
+        thumbnail: str | None = None,
+        image: str | None = None,
+        extra_fields: list[tuple[str, str]] | None = None,
+        timestamp: bool = True,
+    ) -> dict:
+        """Return the payload dict with ``values`` filled into the template's fields in order."""
+        payload = self._static.copy()
+        if title is not None:
+            payload["title"] = title
+        if description is not None:
+            payload["description"] = description
+        if timestamp:
+            payload["timestamp"] = discord.utils.utcnow().isoformat()
+        if thumbnail:
+            payload["thumbnail"] = {"url": thumbnail}
+        if image:
+            payload["image"] = {"url": image}
+
+        fields = [
+            {"name": name, "value": value, "inline": False}
+            for name, value in zip(self._field_names, values)
+        ]
+        if extra_fields:
+            fields.extend({"name": name, "value": value, "inline": False} for name, value in extra_fields)
+        if fields:
+            payload["fields"] = fields
+        return payload
+
+    def embed(self, *values: str, **kwargs) -> PayloadEmbed:
+        return PayloadEmbed(self.render(*values, **kwargs))
@@ -0,0 +1,187 @@
+"""In-process metrics with Prometheus text exposition.
+
+Deliberately tiny: counters, histograms with fixed buckets, and gauges
+backed by a callback (used for queue depths). Everything is registered
+in the module-level ``REGISTRY`` and rendered by ``render()``.
+"""
+
+import asyncio
+import functools
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Callable
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _format_labels(names: tuple[str, ...], values: tuple[str, ...], extra: str = "") -> str:
+    parts = [f'{name}="{value}"' for name, value in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+class Counter:
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, labels: tuple[str, ...] = ()):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self._values: dict[tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1, **labels):
+        key = tuple(str(labels[name]) for name in self.labels)
+        self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self):
+        for key, value in sorted(self._values.items()):
+            yield f"{self.name}{_format_labels(self.labels, key)} {value}"
+
+
+class Histogram:
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        help: str,
+        labels: tuple[str, ...] = (),
+        buckets: tuple[float, ...] = DEFAULT_BUCKETS,
+    ):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.buckets = buckets
+        # key -> [per-bucket counts..., +Inf count, sum]
+        self._series: dict[tuple[str, ...], list] = {}
+
+    def observe(self, value: float, **labels):
+        key = tuple(str(labels[name]) for name in self.labels)
+        series = self._series.get(key)
+        if series is None:
+            series = self._series[key] = [0] * (len(self.buckets) + 1) + [0.0]
+        series[bisect_left(self.buckets, value)] += 1
+        series[-1] += value
+
+    @contextmanager
+    def time(self, **labels):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def summary(self):
+        """Yield (labels dict, count, mean seconds, approximate p95 bucket bound)."""
+        for key, series in sorted(self._series.items()):
+            counts = series[:-1]
+            total = sum(counts)
+            if not total:
+                continue
+            target = total * 0.95
+            running = 0
+            p95 = float("inf")
+            for bound, count in zip(self.buckets, counts):
+                running += count
+                if running >= target:
+                    p95 = bound
+                    break
+            yield dict(zip(self.labels, key)), total, series[-1] / total, p95
+
+    def samples(self):
+        for key, series in sorted(self._series.items()):
+            running = 0
+            for bound, count in zip(self.buckets, series):
+                running += count
+                le = 'le="%s"' % bound
+                yield f"{self.name}_bucket{_format_labels(self.labels, key, le)} {running}"
+            running += series[len(self.buckets)]
+            le = 'le="+Inf"'
+            yield f"{self.name}_bucket{_format_labels(self.labels, key, le)} {running}"
+            yield f"{self.name}_sum{_format_labels(self.labels, key)} {series[-1]}"
+            yield f"{self.name}_count{_format_labels(self.labels, key)} {running}"
+
+
+class Gauge:
+    kind = "gauge"
+
+    def __init__(self, name: str, help: str, callback: Callable[[], float]):
+        self.name = name
+        self.help = help
+        self.callback = callback
+
+    def samples(self):
+        yield f"{self.name} {self.callback()}"
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: dict[str, Counter | Histogram | Gauge] = {}
+
+    def register(self, metric):
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, help: str, labels: tuple[str, ...] = ()) -> Counter:
+        return self.register(Counter(name, help, labels))
+
+    def histogram(self, name: str, help: str, labels: tuple[str, ...] = (), buckets=DEFAULT_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, help, labels, buckets))
+
+    def gauge(self, name: str, help: str, callback: Callable[[], float]) -> Gauge:
+        return self.register(Gauge(name, help, callback))
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics.values():
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.samples())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+
+def timed(histogram: Histogram, label: str = "name"):
+    """Decorator observing the wrapped function's duration, labelled with its __name__."""
+    def decorator(fn):
+        name = fn.__name__
+
+        if asyncio.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def async_wrapper(*args, **kwargs):
+                started = time.perf_counter()
+                try:
+                    return await fn(*args, **kwargs)
+                finally:
+                    histogram.observe(time.perf_counter() - started, **{label: name})
+            return async_wrapper
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                histogram.observe(time.perf_counter() - started, **{label: name})
+        return wrapper
+
+    return decorator
+
+
+async def start_http_server(host: str, port: int):
+    """Serve ``REGISTRY.render()`` on ``/metrics``; returns the aiohttp runner."""
+    from aiohttp import web
+
+    async def handle(request):
+        return web.Response(text=REGISTRY.render(), content_type="text/plain", charset="utf-8")
+
+    app = web.Application()
+    app.router.add_get("/metrics", handle)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+    return runner